@@ -10,22 +10,24 @@ today's high, low, sum, average and weighted averages for each observation
 in the packet.
 """
 
+import bisect
+import collections
 import copy
 import configobj
-import itertools
 import json
 import logging
 import math
+import operator
 import os
 import queue
-import shutil
+import re
+import subprocess
 import sys
-import tempfile
 import threading
 import time
 
 from dataclasses import dataclass
-from typing import Any, Dict, Generator, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Deque, Dict, FrozenSet, Generator, List, Optional, Pattern, Set, Tuple, Union
 from enum import Enum
 from sortedcontainers import SortedDict
 
@@ -50,6 +52,21 @@ from weewx.engine import StdService
 # get a logger object
 log = logging.getLogger(__name__)
 
+# Use orjson (if installed) to serialize loop-data.txt, else fall back to json.
+# Either way, the output is compact and UTF-8 (non-ASCII characters are not escaped).
+try:
+    import orjson
+
+    def encode_json(obj: Dict[str, Any]) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def encode_json(obj: Dict[str, Any]) -> bytes:
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+# Only the data of the temp file needs to be on disk before it is renamed, so use
+# fdatasync (no metadata flush) where the platform has it (macOS does not).
+sync_file_data: Callable[[int], None] = getattr(os, 'fdatasync', os.fsync)
+
 LOOP_DATA_VERSION = '3.3.2'
 
 if sys.version_info[0] < 3 or (sys.version_info[0] == 3 and sys.version_info[1] < 7):
@@ -60,14 +77,53 @@ if weewx.__version__ < "4":
     raise weewx.UnsupportedFeature(
         "weewx-loopdata requires WeeWX 4, found %s" % weewx.__version__)
 
+# Use __slots__ for dataclasses where supported (Python 3.10+).
+dataclass_slots: Dict[str, bool] = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 windrun_bucket_suffixes: List[str] = [ 'N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
                                        'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW' ]
 
+windrun_bucket_obstypes  : Tuple[str, ...] = tuple(sys.intern('windrun_%s' % suffix) for suffix in windrun_bucket_suffixes)
+windrun_bucket_count     : int   = len(windrun_bucket_suffixes)
+# windrun and all windrun_<dir> observation types.
+windrun_obstypes         : FrozenSet[str] = frozenset(('windrun',) + windrun_bucket_obstypes)
+windrun_slice_size       : float = 360.0 / windrun_bucket_count
+windrun_half_slice_size  : float = windrun_slice_size / 2.0
+
+# Valid segments of a field (cheetah name), see LoopData.parse_cname.
+valid_prefixes     : FrozenSet[str] = frozenset([ 'unit' ])
+valid_prefixes2    : FrozenSet[str] = frozenset([ 'label' ])
+valid_fixed_periods: FrozenSet[str] = frozenset([ 'alltime', 'rainyear', 'year', 'month', 'week', 'current', 'hour', 'day' ])
+valid_agg_types    : FrozenSet[str] = frozenset([ 'max', 'min', 'maxtime', 'mintime',
+                                                  'gustdir', 'avg', 'sum', 'vecavg',
+                                                  'vecdir', 'rms' ])
+valid_format_specs : FrozenSet[str] = frozenset([ 'formatted', 'raw', 'ordinal_compass',
+                                                  'desc', 'code' ])
+# A field is either <prefix>.<prefix2>.<obstype> (e.g., unit.label.outTemp) or
+# <period>.<obstype>[.<agg_type>][.<format_spec>] (e.g., day.outTemp.max.formatted).
+# The period (and whether an agg_type is required) is checked by LoopData.parse_cname.
+cname_pattern: Pattern[str] = re.compile(
+    r'(?P<prefix>%s)\.(?P<prefix2>%s)\.(?P<unit_obstype>[^.]*)'
+    r'|(?P<period>[^.]*)\.(?P<obstype>[^.]*)(?:\.(?P<agg_type>%s))?(?:\.(?P<format_spec>%s))?' % (
+        '|'.join(map(re.escape, valid_prefixes)), '|'.join(map(re.escape, valid_prefixes2)),
+        '|'.join(map(re.escape, valid_agg_types)), '|'.join(map(re.escape, valid_format_specs))))
+
+# windrun_<dir> is not supported for these periods.
+windrun_bucket_unsupported_periods: FrozenSet[str] = frozenset([ 'week', 'month', 'year', 'rainyear', 'alltime' ])
+
+# Additional obstypes needed to compute an obstype, see LoopData.compute_period_obstypes.
+obstype_dependencies: Dict[str, Tuple[str, ...]] = {
+    'wind'    : ('windSpeed', 'windDir', 'windGust', 'windGustDir'),
+    'appTemp' : ('outTemp', 'outHumidity', 'windSpeed'),
+    'beaufort': ('windSpeed',) }
+# Additional obstypes needed for windrun and windrun_<dir>.
+windrun_dependencies: Tuple[str, ...] = ('windSpeed', 'windDir')
+
 # Set up windrun_<dir> observation types.
-for suffix in windrun_bucket_suffixes:
-    weewx.units.obs_group_dict['windrun_%s' % suffix] = 'group_distance'
+for obs in windrun_bucket_obstypes:
+    weewx.units.obs_group_dict[obs] = 'group_distance'
 
-@dataclass
+@dataclass(**dataclass_slots)
 class CheetahName:
     field      : str           # $day.outTemp.avg.formatted
     prefix     : Optional[str] # unit or None
@@ -79,7 +135,7 @@ class CheetahName:
     def __hash__(self):
         return hash(self.field)
 
-@dataclass
+@dataclass(**dataclass_slots)
 class ObsTypes:
     current         : Set[str]
     alltime         : Set[str]
@@ -90,8 +146,9 @@ class ObsTypes:
     day             : Set[str]
     hour            : Set[str]
     continuous      : Dict[str, Set[str]] # e.g., continuous['24h'], or ['trend']
+    covers_current  : Dict[str, bool]     # per period, True if it uses every current obstype
 
-@dataclass
+@dataclass(**dataclass_slots)
 class Configuration:
     queue                    : queue.SimpleQueue
     config_dict              : Dict[str, Any]
@@ -99,21 +156,27 @@ class Configuration:
     archive_interval         : int
     loop_data_dir            : str
     filename                 : str
+    local_path               : str # loop_data_dir/filename
     target_report            : str
     loop_frequency           : float
     specified_fields         : Set[str]
     fields_to_include        : Set[CheetahName]
+    fields_by_period         : Dict[str, List[CheetahName]] # fields_to_include keyed by period ('unit' for unit.label fields)
     formatter                : weewx.units.Formatter
     converter                : weewx.units.Converter
     tmpname                  : str
+    sync_on_write            : bool # fdatasync the loop data file before renaming it
     enable                   : bool
     remote_server            : str
     remote_port              : int
     remote_user              : str
     remote_dir               : str
+    remote_path              : Optional[str] # remote_dir/filename
     compress                 : bool
     log_success              : bool
     ssh_options              : str
+    reuse_ssh_connection     : bool
+    ssh_control_path         : Optional[str] # ControlPath of the ssh master connection, if reused
     skip_if_older_than       : int
     timeout                  : int
     time_delta               : int # Used for trend.
@@ -126,10 +189,9 @@ class Configuration:
 #                             ContinuousScalarStats
 # ===============================================================================
 
-@dataclass
+@dataclass(**dataclass_slots)
 class ScalarDebit:
     timestamp : int
-    expiration: int
     value     : float
     weight    : float
 
@@ -146,9 +208,9 @@ class ContinuousScalarStats(object):
     seconds.
 
     addSum(ts, val, weight)
-              |                          future_debits (List)
+              |                          future_debits (Deque)
               |                          --------------------
-              '------------------------> ts|expiration(ts+timelength)|value|weight
+              '------------------------> ts|value|weight
               |
               |
               v
@@ -160,14 +222,15 @@ class ContinuousScalarStats(object):
                     ts
 
     Every time an observation is added (with addSum), a future
-    debit is created with the same information and an expiration of ts + timelength.
+    debit is created with the same information.  It expires at ts + timelength.
     In the continuous accumulator addRecord function, after addSum is called on all
     continuous stats instances, trimExpiredEntries(ts) is called on
     all continuous stats instances.
 
-    The list of future debits is stored in a List.  Each time trimExpiredEntries is
+    The list of future debits is stored in a Deque.  Each time trimExpiredEntries is
     called, the top of the list is iterated on looking for any entries where
-    the expiration is <= the current dateTime.
+    the expiration (ts + timelength) is <= the current dateTime (and they are popped
+    off the left).  The expiration is not stored, as timelength is the same for all.
 
     In addition to the future debit list, a values_dict (SortedDict) is maintained where:
     key  : the value specified in the call to addSum
@@ -189,7 +252,7 @@ class ContinuousScalarStats(object):
 
     def __init__(self, timelength: int):
         self.timelength: int = timelength
-        self.future_debits: List[ScalarDebit] = []
+        self.future_debits: Deque[ScalarDebit] = collections.deque()
         self.values_dict: SortedDict[float, List[int]] = SortedDict()
         self.sum = 0.0
         self.count = 0
@@ -235,17 +298,18 @@ class ContinuousScalarStats(object):
             # Add future debit
             debit= ScalarDebit(
                 timestamp  = ts,
-                expiration = ts + self.timelength,
                 value    = val,
                 weight   = weight)
             self.future_debits.append(debit)
 
     def trimExpiredEntries(self, ts):
         # Remove any debits that may have matured.
-        while len(self.future_debits) > 0 and self.future_debits[0].expiration <= ts:
+        expired_through = ts - self.timelength
+        while len(self.future_debits) > 0 and self.future_debits[0].timestamp <= expired_through:
             # Apply this debit.
-            debit = self.future_debits.pop(0)
-            log.debug('Applying debit: %s value: %f, weight: %f' % (timestamp_to_string(debit.timestamp), debit.value, debit.weight))
+            debit = self.future_debits.popleft()
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Applying debit: %s value: %f, weight: %f', timestamp_to_string(debit.timestamp), debit.value, debit.weight)
             self.sum -= debit.value
             self.count -= 1
             self.wsum -= debit.value * debit.weight
@@ -293,10 +357,9 @@ class ContinuousScalarStats(object):
 #                             ContinuousVecStats
 # ===============================================================================
 
-@dataclass
+@dataclass(**dataclass_slots)
 class VecDebit:
     timestamp : int
-    expiration: int
     speed     : float
     dirN      : float
     weight    : float
@@ -307,9 +370,9 @@ class ContinuousVecStats(object):
     seconds.
 
     addSum(ts, val(speed,dirN), weight)
-              |                          future_debits (List)
+              |                          future_debits (Deque)
               |                          --------------------
-              '------------------------> ts|expiration(ts+timelength)|value|weight
+              '------------------------> ts|value|weight
               |
               |
               v
@@ -321,14 +384,15 @@ class ContinuousVecStats(object):
                     tuple(ts, dirN)
 
     Every time an observation is added (with addSum), a future
-    debit is created with the same information and an expiration of ts + timelength.
+    debit is created with the same information.  It expires at ts + timelength.
     In the continuous accumulator addRecord function, after addSum is called on all
     continuous stats instances, trimExpiredEntries(ts) is called on
     all continuous stats instances.
 
-    The list of future debits is stored in a List.  Each time trimExpiredEntries is
+    The list of future debits is stored in a Deque.  Each time trimExpiredEntries is
     called, the top of the list is iterated on looking for any entries where
-    the expiration is <= the current dateTime.
+    the expiration (ts + timelength) is <= the current dateTime (and they are popped
+    off the left).  The expiration is not stored, as timelength is the same for all.
 
     In addition to the future debit list, a speed_dict (SortedDict) is maintained where:
     key  : the value specified in the call to addSum
@@ -351,7 +415,7 @@ class ContinuousVecStats(object):
 
     def __init__(self, timelength: int):
         self.timelength: int = timelength
-        self.future_debits: List[VecDebit] = []
+        self.future_debits: Deque[VecDebit] = collections.deque()
         self.speed_dict: SortedDict[float, List[Tuple[int, float]]] = SortedDict()
         self.sum = 0.0
         self.count = 0
@@ -431,7 +495,6 @@ class ContinuousVecStats(object):
             # Add future debit
             debit = VecDebit(
                 timestamp  = ts,
-                expiration = ts + self.timelength,
                 speed      = speed,
                 dirN       = dirN,
                 weight     = weight)
@@ -439,9 +502,11 @@ class ContinuousVecStats(object):
 
     def trimExpiredEntries(self, ts):
         # Remove any debits that may have matured.
-        while len(self.future_debits) > 0 and self.future_debits[0].expiration <= ts:
-            debit = self.future_debits.pop(0)
-            log.debug('Applying ContinuousVecStats debit: %s speed: %f, dirN: %r, weight: %f' % (timestamp_to_string(debit.timestamp), debit.speed, debit.dirN, debit.weight))
+        expired_through = ts - self.timelength
+        while len(self.future_debits) > 0 and self.future_debits[0].timestamp <= expired_through:
+            debit = self.future_debits.popleft()
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Applying ContinuousVecStats debit: %s speed: %f, dirN: %r, weight: %f', timestamp_to_string(debit.timestamp), debit.speed, debit.dirN, debit.weight)
             # Apply this debit.
             self.sum -= debit.speed
             self.count -= 1
@@ -515,11 +580,6 @@ class ContinuousVecStats(object):
 #                             ContinuousFirstLastAccum
 # ===============================================================================
 
-@dataclass
-class FirstLastEntry:
-    dateTime: int
-    value   : str
-
 class ContinuousFirstLastAccum(object):
     """Minimal accumulator, suitable for strings.
     It can only return the first and last strings it has seen, along with their timestamps.
@@ -530,45 +590,47 @@ class ContinuousFirstLastAccum(object):
     addSum(ts, val, weight)
               |
               v
-        values_list (List)
-        FirstLastEntry
-        --------------
-        dateTime|value
+        times_list  values_list
+          (Deque)     (Deque)
+        ----------  -----------
+         dateTime  |   value
 
     In the continuous accumulator addRecord function, after addSum is called on all
     continuous stats instances, trimExpiredEntries(ts) is called on
     all continuous stats instances.
 
-    When addSum is called, FirstLastEntry is added to values_list.
+    When addSum is called, the dateTime and (string) value are appended to
+    times_list and values_list (kept in step; no per-entry object is created).
 
     When trimExpiredEntries is called,
-    1. the values_list is iterated over while FirstLastEntry.dateTime <= ts
-    2.     the FirstLastEntry is deleted
+    1. times_list is iterated over while dateTime <= ts - timelength
+    2.     the dateTime and value are popped from times_list and values_list
 
-    first/firsttime is the dateTime value and dateTime of the first entry in values_list
-    last/lasttime is the dateTime value and dateTime of the last entry in values_list
+    first/firsttime is the first value in values_list and its dateTime
+    last/lasttime is the last value in values_list and its dateTime
     """
 
     def __init__(self, timelength: int):
         self.timelength = timelength
-        self.values_list: List[FirstLastEntry] = []
+        self.times_list: Deque[int] = collections.deque()
+        self.values_list: Deque[str] = collections.deque()
 
     def getStatsTuple(self):
         """Return a stats-tuple. That is, a tuple containing the gathered statistics."""
-        return self.values_list[0].value, self.values_list[0].dateTime, self.values_list[-1].value, self.values_list[-1].dateTime,
+        return self.values_list[0], self.times_list[0], self.values_list[-1], self.times_list[-1],
 
     def addSum(self, ts, val, weight=1):
         """Add a scalar value to my running count."""
         if val is not None:
-            string_val = str(val)
-            self.values_list.append(FirstLastEntry(
-                dateTime = ts,
-                value = string_val))
+            self.times_list.append(ts)
+            self.values_list.append(str(val))
 
     def trimExpiredEntries(self, ts):
         # Remove any expired entries
-        while len(self.values_list) > 0 and self.values_list[0].dateTime + self.timelength <= ts:
-            self.values_list.pop(0)
+        expired_through = ts - self.timelength
+        while len(self.times_list) > 0 and self.times_list[0] <= expired_through:
+            self.times_list.popleft()
+            self.values_list.popleft()
 
 
 # ===============================================================================
@@ -769,7 +831,60 @@ def get_add_function(obs_type):
     # If we don't know this nickname, then fail hard with a KeyError
     return ADD_FUNCTIONS[add_nickname]
 
-@dataclass
+# Functions returning each agg_type's value from scalar (or vector) stats, see
+# LoopProcessor.add_period_obstype.  Values not available as attributes of both the
+# weewx and the continuous stats are taken from the stats tuple.
+scalar_agg_getters: Dict[str, Callable[[Any], Any]] = {
+    'min'    : lambda stats: stats.getStatsTuple()[0],
+    'mintime': lambda stats: stats.getStatsTuple()[1],
+    'max'    : lambda stats: stats.getStatsTuple()[2],
+    'maxtime': lambda stats: stats.getStatsTuple()[3],
+    'sum'    : lambda stats: stats.getStatsTuple()[4],
+    'avg'    : operator.attrgetter('avg') }
+vec_agg_getters: Dict[str, Callable[[Any], Any]] = {
+    'min'    : lambda stats: stats.getStatsTuple()[0],
+    'mintime': lambda stats: stats.getStatsTuple()[1],
+    'max'    : lambda stats: stats.getStatsTuple()[2],
+    'maxtime': lambda stats: stats.getStatsTuple()[3],
+    'count'  : lambda stats: stats.getStatsTuple()[5],
+    'gustdir': lambda stats: stats.getStatsTuple()[8],
+    'avg'    : operator.attrgetter('avg'),
+    'sum'    : operator.attrgetter('sum'),
+    'rms'    : operator.attrgetter('rms'),
+    'vecavg' : operator.attrgetter('vec_avg'),
+    'vecdir' : operator.attrgetter('vec_dir') }
+
+# Per type of stats: a function returning whether the stats have any data yet and the
+# agg getters to use.  Other types of stats (i.e., firstlast) are not supported for periods.
+period_stats_handlers: Dict[type, Tuple[Callable[[Any], bool], Dict[str, Callable[[Any], Any]]]] = {
+    weewx.accum.ScalarStats: (lambda stats: stats.lasttime is not None, scalar_agg_getters),
+    ContinuousScalarStats  : (lambda stats: stats.lasttime is not None, scalar_agg_getters),
+    weewx.accum.VecStats   : (lambda stats: stats.count != 0, vec_agg_getters),
+    ContinuousVecStats     : (lambda stats: stats.count != 0, vec_agg_getters) }
+
+# The day summary columns (in stats tuple order) for each supported type of stats.
+day_summary_stats_columns: Dict[type, Tuple[str, ...]] = {
+    weewx.accum.ScalarStats   : ('min', 'mintime', 'max', 'maxtime', 'sum', 'count', 'wsum', 'sumtime'),
+    weewx.accum.VecStats      : ('min', 'mintime', 'max', 'maxtime', 'sum', 'count', 'wsum', 'sumtime',
+                                 'max_dir', 'xsum', 'ysum', 'dirsumtime', 'squaresum', 'wsquaresum'),
+    weewx.accum.FirstLastAccum: ('first', 'firsttime', 'last', 'lasttime') }
+
+# Functions (None if the obstype passes through unchanged) converting an obstype between
+# standard unit systems, keyed by (from unit system, to unit system), then by obstype.
+# See LoopProcessor.convert_packet.
+unit_conversions: Dict[Tuple[int, int], Dict[str, Optional[Callable[[Any], Any]]]] = {}
+
+# SQLite limits a compound SELECT to 500 terms (by default), so at most this many
+# day summaries are read per query, see LoopData.day_summary_records_generator.
+day_summary_union_limit: int = 100
+
+# The continuous stats to use for each supported type of (day accumulator) stats.
+continuous_stats_types: Dict[type, type] = {
+    weewx.accum.ScalarStats   : ContinuousScalarStats,
+    weewx.accum.VecStats      : ContinuousVecStats,
+    weewx.accum.FirstLastAccum: ContinuousFirstLastAccum }
+
+@dataclass(**dataclass_slots)
 class Accumulators:
     alltime_accum        : Optional[weewx.accum.Accum]
     rainyear_accum       : Optional[weewx.accum.Accum]
@@ -780,6 +895,17 @@ class Accumulators:
     hour_accum           : Optional[weewx.accum.Accum]
     continuous           : Dict[str, ContinuousAccum] # e.g., continuous_accums['24h'], or ['trend']
 
+# Functions returning the accumulator for each fixed period, see
+# LoopProcessor.create_loopdata_packet.  Continuous periods are in Accumulators.continuous.
+fixed_period_accum_getters: Dict[str, Callable[[Accumulators], Optional[weewx.accum.Accum]]] = {
+    'alltime' : operator.attrgetter('alltime_accum'),
+    'rainyear': operator.attrgetter('rainyear_accum'),
+    'year'    : operator.attrgetter('year_accum'),
+    'month'   : operator.attrgetter('month_accum'),
+    'week'    : operator.attrgetter('week_accum'),
+    'day'     : operator.attrgetter('day_accum'),
+    'hour'    : operator.attrgetter('hour_accum') }
+
 class BarometerTrend(Enum):
     RISING_VERY_RAPIDLY  =  4
     RISING_QUICKLY       =  3
@@ -791,20 +917,43 @@ class BarometerTrend(Enum):
     FALLING_QUICKLY      = -3
     FALLING_VERY_RAPIDLY = -4
 
-@dataclass
-class Reading:
-    dateTime: int
-    value   : Any
-
-@dataclass
-class PeriodPacket:
-    timestamp: int
-    packet   : Dict[str, Any]
+# Barometer trends in ascending order, indexed by the number of
+# baro_trend_thresholds that a (3 hour, mbar) change crosses.
+baro_trends: Tuple[BarometerTrend, ...] = (
+    BarometerTrend.FALLING_VERY_RAPIDLY,
+    BarometerTrend.FALLING_QUICKLY,
+    BarometerTrend.FALLING,
+    BarometerTrend.FALLING_SLOWLY,
+    BarometerTrend.STEADY,
+    BarometerTrend.RISING_SLOWLY,
+    BarometerTrend.RISING,
+    BarometerTrend.RISING_QUICKLY,
+    BarometerTrend.RISING_VERY_RAPIDLY)
+baro_trend_thresholds: Tuple[float, ...] = (-6.0, -3.5, -1.5, -0.1, 0.1, 1.5, 3.5, 6.0)
+# True if the change must be strictly greater than the threshold to cross it
+# (else greater than or equal).
+baro_trend_threshold_exclusive: Tuple[bool, ...] = (False, False, False, True, False, True, True, True)
+# Barometer changes are converted to mbar (the unit of the thresholds above).
+# A Converter is read-only once constructed, so one is shared.
+baro_trend_converter: weewx.units.Converter = weewx.units.Converter(weewx.units.MetricUnits)
+
+@dataclass(**dataclass_slots)
+class FieldConversion:
+    src_type  : Optional[str]
+    src_group : Optional[str]
+    tgt_type  : Optional[str]
+    tgt_group : Optional[str]
+    conversion: Optional[Callable[[Any], Any]] # None if no conversion is needed
+
+# The conversion of an obstype (with an agg_type) from a standard unit system by a
+# converter, keyed by (converter, unit system, obstype, agg_type).
+# See LoopProcessor.get_field_conversion.
+field_conversions: Dict[Tuple[weewx.units.Converter, int, str, Optional[str]], FieldConversion] = {}
 
 class LoopData(StdService):
     def __init__(self, engine, config_dict):
         super(LoopData, self).__init__(engine, config_dict)
-        log.info("Service version is %s." % LOOP_DATA_VERSION)
+        log.info("Service version is %s.", LOOP_DATA_VERSION)
 
         if sys.version_info[0] < 3:
             raise Exception("Python 3 is required for the loopdata plugin.")
@@ -824,18 +973,15 @@ class LoopData(StdService):
 
         # Get the unit_system as specified by StdConvert->target_unit.
         # Note: this value will be overwritten if the day accumulator has a a unit_system.
-        db_binder = weewx.manager.DBBinder(config_dict)
+        # The database manager is kept for use in pre_loop and new_loop.
+        self.db_binder = weewx.manager.DBBinder(config_dict)
         default_binding = config_dict.get('StdReport')['data_binding']
-        dbm = db_binder.get_manager(default_binding)
-        unit_system = dbm.std_unit_system
+        self.dbm = self.db_binder.get_manager(default_binding)
+        unit_system = self.dbm.std_unit_system
         if unit_system is None:
             unit_system = weewx.units.unit_constants[self.config_dict['StdConvert'].get('target_unit', 'US').upper()]
         # Get the column names of the archive table.
-        self.archive_columns: List[str] = dbm.connection.columnsOf('archive')
-
-        # Get a temporay file in which to write data before renaming.
-        tmp = tempfile.NamedTemporaryFile(prefix='LoopData', delete=False)
-        tmp.close()
+        self.archive_columns: List[str] = self.dbm.connection.columnsOf('archive')
 
         # Get a target report dictionary we can use for converting units and formatting.
         target_report = formatting_spec_dict.get('target_report', 'LoopDataReport')
@@ -843,10 +989,22 @@ class LoopData(StdService):
             target_report_dict = LoopData.get_target_report_dict(
                 config_dict, target_report)
         except Exception as e:
-            log.error('Could not find target_report: %s.  LoopData is exiting. Exception: %s' % (target_report, e))
+            log.error('Could not find target_report: %s.  LoopData is exiting. Exception: %s', target_report, e)
             return
 
         loop_data_dir = LoopData.compose_loop_data_dir(config_dict, target_report_dict, file_spec_dict)
+        if not os.path.exists(loop_data_dir):
+            os.makedirs(loop_data_dir)
+
+        filename: str = file_spec_dict.get('filename', 'loop-data.txt')
+
+        # The temporary file in which to write data before renaming.
+        # It is in loop_data_dir so that the rename is on the same filesystem.
+        tmpname: str = os.path.join(loop_data_dir, '.%s.tmp' % filename)
+
+        # The loop data file is rewritten every loop packet, so by default don't pay
+        # for flushing each copy to disk.
+        sync_on_write: bool = to_bool(file_spec_dict.get('sync', False))
 
         # Get the loop frequency seconds to be passed as the weight to accumulators.
         loop_frequency = to_float(loop_frequency_spec_dict.get('seconds', '2.0'))
@@ -862,7 +1020,7 @@ class LoopData(StdService):
         try:
             time_delta: int = to_int(target_report_dict['Units']['Trend']['time_delta'])
             if time_delta > 259200:
-                log.info('time_delta of %d specified, LoopData will use max value of 259200.' % time_delta)
+                log.info('time_delta of %d specified, LoopData will use max value of 259200.', time_delta)
                 time_delta = 259200
         except KeyError:
             time_delta = 10800
@@ -879,29 +1037,50 @@ class LoopData(StdService):
         except KeyError:
             rainyear_start = 1
 
+        remote_dir: Optional[str] = rsync_spec_dict.get('remote_dir')
+
+        # Optionally, reuse one ssh connection (ControlMaster) across rsync invocations
+        # rather than paying for a connection/key exchange on every loop packet.
+        enable: bool = to_bool(rsync_spec_dict.get('enable'))
+        if enable and remote_dir is None:
+            log.error('RsyncSpec enable is true, but no remote_dir is specified; rsync disabled.')
+            enable = False
+        reuse_ssh_connection: bool = to_bool(rsync_spec_dict.get('reuse_ssh_connection', False))
+        ssh_options: str = rsync_spec_dict.get('ssh_options', '-o ConnectTimeout=1')
+        ssh_control_path: Optional[str] = None
+        if enable and reuse_ssh_connection:
+            ssh_control_path = LoopData.compose_ssh_control_path()
+            ssh_options = LoopData.compose_ssh_options(ssh_options, ssh_control_path)
+
         self.cfg: Configuration = Configuration(
             queue                    = queue.SimpleQueue(),
             config_dict              = config_dict,
             unit_system              = unit_system,
             archive_interval         = to_int(std_archive_dict.get('archive_interval')),
             loop_data_dir            = loop_data_dir,
-            filename                 = file_spec_dict.get('filename', 'loop-data.txt'),
+            filename                 = filename,
+            local_path               = os.path.join(loop_data_dir, filename),
             target_report            = target_report,
             loop_frequency           = loop_frequency,
             specified_fields         = specified_fields,
             fields_to_include        = fields_to_include,
+            fields_by_period         = LoopData.group_fields_by_period(fields_to_include),
             formatter                = weewx.units.Formatter.fromSkinDict(target_report_dict),
             converter                = weewx.units.Converter.fromSkinDict(target_report_dict),
-            tmpname                  = tmp.name,
-            enable                   = to_bool(rsync_spec_dict.get('enable')),
+            tmpname                  = tmpname,
+            sync_on_write            = sync_on_write,
+            enable                   = enable,
             remote_server            = rsync_spec_dict.get('remote_server'),
             remote_port              = to_int(rsync_spec_dict.get('remote_port')) if rsync_spec_dict.get(
                                       'remote_port') is not None else None,
             remote_user              = rsync_spec_dict.get('remote_user'),
-            remote_dir               = rsync_spec_dict.get('remote_dir'),
+            remote_dir               = remote_dir,
+            remote_path              = os.path.join(remote_dir, filename) if remote_dir is not None else None,
             compress                 = to_bool(rsync_spec_dict.get('compress')),
             log_success              = to_bool(rsync_spec_dict.get('log_success')),
-            ssh_options              = rsync_spec_dict.get('ssh_options', '-o ConnectTimeout     =1'),
+            ssh_options              = ssh_options,
+            reuse_ssh_connection     = reuse_ssh_connection,
+            ssh_control_path         = ssh_control_path,
             timeout                  = to_int(rsync_spec_dict.get('timeout', 1)),
             skip_if_older_than       = to_int(rsync_spec_dict.get('skip_if_older_than', 3)),
             time_delta               = time_delta,
@@ -910,14 +1089,18 @@ class LoopData(StdService):
             obstypes                 = obstypes,
             baro_trend_descs         = baro_trend_descs)
 
-        if not os.path.exists(self.cfg.loop_data_dir):
-            os.makedirs(self.cfg.loop_data_dir)
-
-        log.info('LoopData file is: %s' % os.path.join(self.cfg.loop_data_dir, self.cfg.filename))
+        log.info('LoopData file is: %s', self.cfg.local_path)
 
         self.bind(weewx.PRE_LOOP, self.pre_loop)
         self.bind(weewx.NEW_LOOP_PACKET, self.new_loop)
 
+    def shutDown(self):
+        self.db_binder.close()
+        cfg: Optional[Configuration] = getattr(self, 'cfg', None)
+        if cfg is not None and cfg.ssh_control_path is not None:
+            LoopData.stop_ssh_master(cfg.ssh_control_path, cfg.remote_server,
+                cfg.remote_port, cfg.remote_user)
+
     @staticmethod
     def massage_near_zero(val: float)-> float:
         if val > -0.0000000001 and val < 0.0000000001:
@@ -936,9 +1119,38 @@ class LoopData(StdService):
         loop_data_dir: str = str(file_spec_dict.get('loop_data_dir', '.'))
         return os.path.join(weewx_root, html_root, loop_data_dir)
 
+    @staticmethod
+    def compose_ssh_options(ssh_options: str, control_path: str) -> str:
+        # Have ssh keep a master connection open (for 10 minutes after last use)
+        # that subsequent rsync invocations multiplex over.
+        return '%s -o ControlMaster=auto -o ControlPath=%s -o ControlPersist=600' % (
+            ssh_options, control_path)
+
+    @staticmethod
+    def compose_ssh_control_path() -> str:
+        # The socket lives in ~/.ssh (the same place on every start, so nothing is
+        # left behind).  %C is a fixed length hash of the connection's user, host and
+        # port; this keeps the path under the Unix socket path limit (104 bytes on macOS).
+        ssh_dir: str = os.path.expanduser(os.path.join('~', '.ssh'))
+        os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
+        return os.path.join(ssh_dir, 'loopdata-%C')
+
+    @staticmethod
+    def stop_ssh_master(control_path: str, remote_server: str, remote_port: Optional[int],
+            remote_user: Optional[str]) -> None:
+        # Ask the ssh master connection (if one is running) to exit, rather than
+        # leaving it up for ControlPersist after weewx stops.
+        cmd: List[str] = ['ssh', '-o', 'ControlPath=%s' % control_path, '-O', 'exit']
+        if remote_port is not None:
+            cmd.extend(['-p', str(remote_port)])
+        cmd.append('%s@%s' % (remote_user, remote_server) if remote_user else remote_server)
+        try:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+        except (OSError, subprocess.SubprocessError) as e:
+            log.debug('Could not stop ssh master connection: %s', e)
+
     @staticmethod
     def is_valid_period(period: str)-> bool:
-        valid_fixed_periods     : List[str] = [ 'alltime', 'rainyear', 'year', 'month', 'week', 'current', 'hour', 'day' ]
         if period in valid_fixed_periods or LoopData.is_continuous_period(period):
             return True
         return False
@@ -993,78 +1205,97 @@ class LoopData(StdService):
         Return ObsTypes (fields_to_include and obstypes)
         """
         fields_to_include: Set[CheetahName] = set()
-        continuous_periods: Set[str] = set()
         for field in specified_fields:
             cname: Optional[CheetahName] = LoopData.parse_cname(field)
             if cname is not None:
                 fields_to_include.add(cname)
-                if cname.period is not None and LoopData.is_continuous_period(cname.period):
-                    continuous_periods.add(cname.period)
 
-        current_obstypes  : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'current')
+        # Obstypes needed for each period (computed in a single pass over the fields).
+        period_obstypes: Dict[str, Set[str]] = LoopData.compute_period_obstypes(fields_to_include)
 
         # Fixed Periods
-        alltime_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'alltime')
-        rainyear_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'rainyear')
-        year_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'year')
-        month_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'month')
-        week_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'week')
-        day_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'day')
-        hour_obstypes    : Set[str] = LoopData.compute_period_obstypes(
-            fields_to_include, 'hour')
+        alltime_obstypes : Set[str] = period_obstypes.get('alltime', set())
+        rainyear_obstypes: Set[str] = period_obstypes.get('rainyear', set())
+        year_obstypes    : Set[str] = period_obstypes.get('year', set())
+        month_obstypes   : Set[str] = period_obstypes.get('month', set())
+        week_obstypes    : Set[str] = period_obstypes.get('week', set())
+        day_obstypes     : Set[str] = period_obstypes.get('day', set())
+        hour_obstypes    : Set[str] = period_obstypes.get('hour', set())
 
         # Contiunous Periods
-        continuous_obstypes: Dict[str, Set[str]] = {}
-        for per in continuous_periods:
-            continuous_obstypes[per] = LoopData.compute_period_obstypes(
-                fields_to_include, per)
-            current_obstypes.update(continuous_obstypes[per])
+        continuous_obstypes: Dict[str, Set[str]] = {
+            per: obstypes for per, obstypes in period_obstypes.items() if LoopData.is_continuous_period(per) }
 
         # current_obstypes is special because current observations are
         # needed to feed all the others.  As such, take the union of all.
-        # continuous period obstypes were added above.
-        current_obstypes = set(itertools.chain(current_obstypes, alltime_obstypes,
-            rainyear_obstypes, year_obstypes, month_obstypes, week_obstypes, day_obstypes, hour_obstypes))
-
-        return (fields_to_include, 
-                ObsTypes(
-                    current         = current_obstypes,
-                    alltime         = alltime_obstypes,
-                    rainyear        = rainyear_obstypes,
-                    year            = year_obstypes,
-                    month           = month_obstypes,
-                    week            = week_obstypes,
-                    day             = day_obstypes,
-                    hour            = hour_obstypes,
-                    continuous      = continuous_obstypes))
+        current_obstypes: Set[str] = set().union(*period_obstypes.values())
+
+        obstypes: ObsTypes = ObsTypes(
+            current         = current_obstypes,
+            alltime         = alltime_obstypes,
+            rainyear        = rainyear_obstypes,
+            year            = year_obstypes,
+            month           = month_obstypes,
+            week            = week_obstypes,
+            day             = day_obstypes,
+            hour            = hour_obstypes,
+            continuous      = continuous_obstypes,
+            covers_current  = {})
+        obstypes.covers_current = LoopData.compute_covers_current(obstypes)
+        return (fields_to_include, obstypes)
 
     @staticmethod
-    def compute_period_obstypes(fields_to_include: Set[CheetahName], period: str) -> Set[str]:
-        period_obstypes: Set[str] = set()
+    def compute_covers_current(obstypes: ObsTypes) -> Dict[str, bool]:
+        """Per period, whether the period uses every current obstype (in which case the
+           packet, already pruned to the current obstypes, needn't be pruned again).
+           Must be recomputed whenever the period obstypes are trimmed."""
+        covers_current: Dict[str, bool] = {
+            'alltime' : obstypes.alltime.issuperset(obstypes.current),
+            'rainyear': obstypes.rainyear.issuperset(obstypes.current),
+            'year'    : obstypes.year.issuperset(obstypes.current),
+            'month'   : obstypes.month.issuperset(obstypes.current),
+            'week'    : obstypes.week.issuperset(obstypes.current),
+            'day'     : obstypes.day.issuperset(obstypes.current),
+            'hour'    : obstypes.hour.issuperset(obstypes.current) }
+        for per, per_obstypes in obstypes.continuous.items():
+            covers_current[per] = per_obstypes.issuperset(obstypes.current)
+        return covers_current
+
+    @staticmethod
+    def group_fields_by_period(fields_to_include: Set[CheetahName]) -> Dict[str, List[CheetahName]]:
+        """
+        Group fields by period so that the period (and its accumulator) is
+        resolved once per packet rather than once per field.  unit.label
+        fields are grouped under 'unit'.
+        """
+        fields_by_period: Dict[str, List[CheetahName]] = {}
         for cname in fields_to_include:
-            if cname.period == period:
-                period_obstypes.add(cname.obstype)
-                if cname.obstype == 'wind':
-                    period_obstypes.add('windSpeed')
-                    period_obstypes.add('windDir')
-                    period_obstypes.add('windGust')
-                    period_obstypes.add('windGustDir')
-                if cname.obstype == 'appTemp':
-                    period_obstypes.add('outTemp')
-                    period_obstypes.add('outHumidity')
-                    period_obstypes.add('windSpeed')
-                if cname.obstype.startswith('windrun'):
-                    period_obstypes.add('windSpeed')
-                    period_obstypes.add('windDir')
-                if cname.obstype == 'beaufort':
-                    period_obstypes.add('windSpeed')
+            if cname.prefix == 'unit':
+                key = 'unit'
+            else:
+                # Every non-unit field parsed by parse_cname carries a period.
+                assert cname.period is not None
+                key = cname.period
+            fields_by_period.setdefault(key, []).append(cname)
+        return fields_by_period
+
+    @staticmethod
+    def compute_period_obstypes(fields_to_include: Set[CheetahName]) -> Dict[str, Set[str]]:
+        """
+        Return the obstypes needed for each period (keyed by period).
+        """
+        period_obstypes: Dict[str, Set[str]] = {}
+        for cname in fields_to_include:
+            if cname.period is None:
+                # unit.label fields need no obstypes
+                continue
+            obstypes: Set[str] = period_obstypes.setdefault(cname.period, set())
+            obstypes.add(cname.obstype)
+            dependencies = obstype_dependencies.get(cname.obstype)
+            if dependencies is None and cname.obstype.startswith('windrun'):
+                dependencies = windrun_dependencies
+            if dependencies is not None:
+                obstypes.update(dependencies)
         return period_obstypes
 
     @staticmethod
@@ -1126,9 +1357,7 @@ class LoopData(StdService):
         self.loop_processor_started = True
 
         try:
-            binder = weewx.manager.DBBinder(self.config_dict)
-            binding = self.config_dict.get('StdReport')['data_binding']
-            dbm = binder.get_manager(binding)
+            dbm = self.dbm
 
             # Get archive packets to prime accumulators.  First find earliest
             # record we need to fetch.
@@ -1138,24 +1367,17 @@ class LoopData(StdService):
 
             # We want the earliest time needed.
             start_of_day: int = weeutil.weeutil.startOfDay(now)
-            log.debug('Earliest time selected is %s' % timestamp_to_string(start_of_day))
-
-            # Fetch the records.
-            start = time.time()
-            archive_pkts: List[Dict[str, Any]] = LoopData.get_archive_packets(
-                dbm, self.archive_columns, start_of_day)
-
-            # Save packets as appropriate.
-            pkt_count: int = 0
-            for pkt in archive_pkts:
-                pkt_time = pkt['dateTime']
-                if 'windrun' in pkt and 'windDir' in pkt and pkt['windDir'] is not None:
-                    bkt = LoopProcessor.get_windrun_bucket(pkt['windDir'])
-                    pkt['windrun_%s' % windrun_bucket_suffixes[bkt]] = pkt['windrun']
-                if len(self.cfg.obstypes.day) > 0 and pkt_time >= start_of_day:
-                    self.day_packets.append(pkt)
-                pkt_count += 1
-            log.debug('Collected %d archive packets in %f seconds.' % (pkt_count, time.time() - start))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Earliest time selected is %s', timestamp_to_string(start_of_day))
+
+            # Today's archive packets are only needed (to compute the windrun_<dir>
+            # day stats) if there are day obstypes.  Only records after start_of_day
+            # that have a windDir are fetched, so every packet fetched is saved.
+            if len(self.cfg.obstypes.day) > 0 and 'windrun' in self.archive_columns and 'windDir' in self.archive_columns:
+                # Fetch the records.
+                start = time.monotonic()
+                self.day_packets = LoopData.get_windrun_bucket_packets(dbm, start_of_day)
+                log.debug('Collected %d archive packets in %f seconds.', len(self.day_packets), time.monotonic() - start)
 
             # accumulator_payload_sent is used to only create accumulators on first new_loop packet
             self.accumulator_payload_sent = False
@@ -1164,46 +1386,70 @@ class LoopData(StdService):
             t.setName('LoopData')
             t.setDaemon(True)
             t.start()
+            # Start the writer thread (writes, and optionally rsyncs, loop-data.txt).
+            w: threading.Thread = threading.Thread(target=lp.process_write_queue)
+            w.setName('LoopDataWriter')
+            w.setDaemon(True)
+            w.start()
         except Exception as e:
             # Print problem to log and give up.
-            log.error('Error in LoopData setup.  LoopData is exiting. Exception: %s' % e)
+            log.error('Error in LoopData setup.  LoopData is exiting. Exception: %s', e)
             weeutil.logger.log_traceback(log.error, "    ****  ")
 
     @staticmethod
-    def day_summary_records_generator(dbm, obstype: str, earliest_time: int
-            ) -> Generator[Dict[str, Any], None, None]:
-        table_name = 'archive_day_%s' % obstype
-        cols: List[str] = dbm.connection.columnsOf(table_name)
-        for row in dbm.genSql('SELECT * FROM %s' \
-                ' WHERE dateTime >= %d ORDER BY dateTime ASC' % (table_name, earliest_time)):
-            record: Dict[str, Any] = {}
-            for i in range(len(cols)):
-                record[cols[i]] = row[i]
-            log.debug('get_day_summary_records: record(%s): %s' % (
-                timestamp_to_string(record['dateTime']), record))
-            yield record
+    def day_summary_records_generator(dbm, earliest_times: Dict[str, int], columns: Tuple[str, ...]
+            ) -> Generator[Tuple[str, int, Tuple[Any, ...]], None, None]:
+        """Yield (obstype, dateTime, stats tuple) for each obstype's day summary records at
+           or after its earliest time.  The day summaries (which must all have the given
+           columns) are read with one UNION ALL query per day_summary_union_limit obstypes.
+           Records are in dateTime order (per obstype)."""
+        obstypes: List[str] = list(earliest_times)
+        debug_enabled: bool = log.isEnabledFor(logging.DEBUG)
+        for i in range(0, len(obstypes), day_summary_union_limit):
+            batch: List[str] = obstypes[i:i + day_summary_union_limit]
+            sql: str = ' UNION ALL '.join('SELECT ?, dateTime, %s FROM archive_day_%s WHERE dateTime >= ?' % (
+                ', '.join(columns), obstype) for obstype in batch) + ' ORDER BY dateTime ASC'
+            params: List[Any] = []
+            for obstype in batch:
+                params.extend((obstype, earliest_times[obstype]))
+            for row in dbm.genSql(sql, params):
+                if debug_enabled:
+                    log.debug('day_summary_records_generator: %s record(%s): %s',
+                        row[0], timestamp_to_string(row[1]), row[2:])
+                yield row[0], row[1], row[2:]
+
+    @staticmethod
+    def get_windrun_bucket_packets(dbm, earliest_time: int) -> List[Dict[str, Any]]:
+        """Return a packet (dateTime, interval and windrun_<dir>) for every archive record
+           after earliest_time that has a windDir."""
+        get_windrun_bucket = LoopProcessor.get_windrun_bucket
+        return [{'dateTime': date_time, 'interval': interval,
+                 windrun_bucket_obstypes[get_windrun_bucket(wind_dir)]: windrun}
+            for date_time, interval, windrun, wind_dir in dbm.genSql(
+                'SELECT dateTime, interval, windrun, windDir FROM archive'
+                ' WHERE dateTime > ? AND windDir IS NOT NULL ORDER BY dateTime ASC', (earliest_time,))]
 
     @staticmethod
-    def get_archive_packets(dbm, archive_columns: List[str],
-            earliest_time: int) -> List[Dict[str, Any]]:
-        packets = []
-        for cols in dbm.genSql('SELECT * FROM archive' \
-                ' WHERE dateTime > %d ORDER BY dateTime ASC' % earliest_time):
-            pkt: Dict[str, Any] = {}
-            for i in range(len(cols)):
-                pkt[archive_columns[i]] = cols[i]
-            packets.append(pkt)
-            log.debug('get_archive_packets: pkt(%s): %s' % (
-                timestamp_to_string(pkt['dateTime']), pkt))
-        return packets
+    def get_archive_packets(dbm, archive_columns: List[str], earliest_time: int, obstypes: Set[str]
+            ) -> Generator[Dict[str, Any], None, None]:
+        """Yield archive packets after earliest_time, containing dateTime, interval and
+           those of obstypes that are archive columns."""
+        cols: Tuple[str, ...] = tuple(col for col in archive_columns
+            if col == 'dateTime' or col == 'interval' or col in obstypes)
+        debug_enabled: bool = log.isEnabledFor(logging.DEBUG)
+        for row in dbm.genSql('SELECT %s FROM archive' \
+                ' WHERE dateTime > ? ORDER BY dateTime ASC' % ', '.join(cols), (earliest_time,)):
+            pkt: Dict[str, Any] = dict(zip(cols, row))
+            if debug_enabled:
+                log.debug('get_archive_packets: pkt(%s): %s',
+                    timestamp_to_string(pkt['dateTime']), pkt)
+            yield pkt
 
     def new_loop(self, event):
-        log.debug('new_loop: event: %s' % event)
+        log.debug('new_loop: event: %s', event)
         if not self.accumulator_payload_sent:
             self.accumulator_payload_sent = True
-            binder = weewx.manager.DBBinder(self.config_dict)
-            binding = self.config_dict.get('StdReport')['data_binding']
-            dbm = binder.get_manager(binding)
+            dbm = self.dbm
             pkt_time = to_int(event.packet['dateTime'])
 
             # Init day accumulator from day_summary
@@ -1220,24 +1466,33 @@ class LoopData(StdService):
             # Need to add the windrun_<bucket> accumulators.
             for pkt in self.day_packets:
                 if day_accum.timespan.includesArchiveTime(pkt['dateTime']):
-                    for suffix in windrun_bucket_suffixes:
-                        obs = 'windrun_%s' % suffix
+                    for obs in windrun_bucket_obstypes:
                         if obs in pkt:
                             day_accum.add_value(pkt, obs, True, pkt['interval'] * 60)
-                            continue
+                            break
             self.day_packets = []
 
             # Create fixed accums
-            alltime_accum, self.cfg.obstypes.alltime = LoopData.create_alltime_accum(
-                self.cfg.unit_system, self.cfg.archive_interval, self.cfg.obstypes.alltime, day_accum, dbm)
-            rainyear_accum, self.cfg.obstypes.rainyear = LoopData.create_rainyear_accum(
-                self.cfg.unit_system, self.cfg.archive_interval, self.cfg.obstypes.rainyear, pkt_time, self.cfg.rainyear_start, day_accum, dbm)
-            year_accum, self.cfg.obstypes.year = LoopData.create_year_accum(
-                self.cfg.unit_system, self.cfg.archive_interval, self.cfg.obstypes.year, pkt_time, day_accum, dbm)
-            month_accum, self.cfg.obstypes.month = LoopData.create_month_accum(
-                self.cfg.unit_system, self.cfg.archive_interval, self.cfg.obstypes.month, pkt_time, day_accum, dbm)
-            week_accum, self.cfg.obstypes.week = LoopData.create_week_accum(
-                self.cfg.unit_system, self.cfg.archive_interval, self.cfg.obstypes.week, pkt_time, self.cfg.week_start, day_accum, dbm)
+            # Periods longer than a day are all primed in one pass over the day summaries.
+            spans: Dict[str, weeutil.weeutil.TimeSpan] = {
+                # Pick a timespan such that all observations will be included
+                # Span from Friday, January 2, 1970 12:00:00 AM UTC to January 1, 2525 12:00:00 AM UTC
+                'alltime' : weeutil.weeutil.TimeSpan(86400, 17514144000),
+                'rainyear': weeutil.weeutil.archiveRainYearSpan(pkt_time, self.cfg.rainyear_start),
+                'year'    : weeutil.weeutil.archiveYearSpan(pkt_time),
+                'month'   : weeutil.weeutil.archiveMonthSpan(pkt_time),
+                'week'    : weeutil.weeutil.archiveWeekSpan(pkt_time, self.cfg.week_start)}
+            period_accums = LoopData.create_day_summary_accums(self.cfg.unit_system, spans, {
+                'alltime' : self.cfg.obstypes.alltime,
+                'rainyear': self.cfg.obstypes.rainyear,
+                'year'    : self.cfg.obstypes.year,
+                'month'   : self.cfg.obstypes.month,
+                'week'    : self.cfg.obstypes.week}, day_accum, dbm)
+            alltime_accum, self.cfg.obstypes.alltime = period_accums['alltime']
+            rainyear_accum, self.cfg.obstypes.rainyear = period_accums['rainyear']
+            year_accum, self.cfg.obstypes.year = period_accums['year']
+            month_accum, self.cfg.obstypes.month = period_accums['month']
+            week_accum, self.cfg.obstypes.week = period_accums['week']
             hour_accum, self.cfg.obstypes.hour = LoopData.create_hour_accum(
                 self.cfg.unit_system, self.cfg.archive_interval, self.cfg.obstypes.hour, pkt_time, day_accum, dbm)
 
@@ -1256,6 +1511,9 @@ class LoopData(StdService):
                 if cont_accum:
                     continuous_accums[per], self.cfg.obstypes.continuous[per]  = cont_accum, obstypes
 
+            # The period obstypes may have been trimmed above.
+            self.cfg.obstypes.covers_current = LoopData.compute_covers_current(self.cfg.obstypes)
+
             self.cfg.queue.put(Accumulators(
                 alltime_accum  = alltime_accum,
                 rainyear_accum = rainyear_accum,
@@ -1268,58 +1526,85 @@ class LoopData(StdService):
         self.cfg.queue.put(event)
 
     @staticmethod
-    def create_alltime_accum(unit_system: int, archive_interval: int, obstypes: Set[str], 
-            day_accum: weewx.accum.Accum, dbm) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        log.debug('Creating alltime_accum')
-        # Pick a timespan such that all observations will be included
-        # Span from Friday, January 2, 1970 12:00:00 AM UTC to January 1, 2525 12:00:00 AM UTC
-        span = weeutil.weeutil.TimeSpan(86400, 17514144000)
-        return LoopData.create_period_accum('alltime', unit_system, archive_interval, obstypes, span, day_accum, dbm)
-
-    @staticmethod
-    def create_rainyear_accum(unit_system: int, archive_interval: int, obstypes: Set[str], pkt_time: int,
-            rainyear_start: int, day_accum: weewx.accum.Accum, dbm) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        log.debug('Creating initial rainyear_accum')
-        span = weeutil.weeutil.archiveRainYearSpan(pkt_time, rainyear_start)
-        return LoopData.create_period_accum('rainyear', unit_system, archive_interval, obstypes, span, day_accum, dbm)
-
-    @staticmethod
-    def create_year_accum(unit_system: int, archive_interval: int, obstypes: Set[str], pkt_time: int, day_accum: weewx.accum.Accum, dbm
-            ) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        log.debug('Creating initial year_accum')
-        span = weeutil.weeutil.archiveYearSpan(pkt_time)
-        return LoopData.create_period_accum('year', unit_system, archive_interval, obstypes, span, day_accum, dbm)
-
-    @staticmethod
-    def create_month_accum(unit_system: int, archive_interval: int, obstypes: Set[str], pkt_time: int, day_accum: weewx.accum.Accum, dbm
-            ) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        log.debug('Creating initial month_accum')
-        span = weeutil.weeutil.archiveMonthSpan(pkt_time)
-        return LoopData.create_period_accum('month', unit_system, archive_interval, obstypes, span, day_accum, dbm)
+    def create_day_summary_accums(unit_system: int, spans: Dict[str, weeutil.weeutil.TimeSpan],
+            period_obstypes: Dict[str, Set[str]], day_accum: weewx.accum.Accum, dbm
+            ) -> Dict[str, Tuple[Optional[weewx.accum.Accum], Set[str]]]:
+        """return, per period in spans, the accumulator and (possibly trimmed) obstypes
+
+        The day summary records for each obstype are read once, starting at the earliest
+        span that needs the obstype, and merged into every period whose span includes them."""
+
+        start = time.monotonic()
+        accums: Dict[str, Optional[weewx.accum.Accum]] = {}
+        valid_obstypes: Dict[str, Set[str]] = {}
+        for name, span in spans.items():
+            accums[name] = weewx.accum.Accum(span, unit_system) if len(period_obstypes[name]) != 0 else None
+            valid_obstypes[name] = set()
+
+        # The obstypes to read (and their earliest time) grouped by stats type (as
+        # day summaries of the same stats type have the same columns), and the
+        # (span start, stats) of each period to be merged into for each obstype.
+        earliest_times: Dict[type, Dict[str, int]] = {}
+        targets: Dict[str, List[Tuple[int, Any]]] = {}
+        for obstype in set().union(*period_obstypes.values()):
+            names: List[str] = [name for name in spans if obstype in period_obstypes[name]]
+            if obstype not in day_accum:
+                # Obstypes implemented with xtypes will fall out here.
+                # As well as typos or any obstype that is not in day_accum.
+                for name in names:
+                    log.info('Ignoring %s for %s time period as this observation has no day accumulator.', obstype, name)
+                continue
+            stats_type = type(day_accum[obstype])
+            if stats_type not in day_summary_stats_columns:
+                for name in names:
+                    accums[name] = None
+                continue
+            obstype_targets: List[Tuple[int, Any]] = []
+            for name in names:
+                accum = accums[name]
+                if accum is None:
+                    continue
+                valid_obstypes[name].add(obstype)
+                stats = stats_type()
+                accum[obstype] = stats
+                obstype_targets.append((spans[name].start, stats))
+            if len(obstype_targets) == 0:
+                continue
+            targets[obstype] = obstype_targets
+            earliest_times.setdefault(stats_type, {})[obstype] = min(
+                span_start for span_start, _ in obstype_targets)
+
+        record_count = 0
+        for stats_type, type_earliest_times in earliest_times.items():
+            for obstype, date_time, stats_tuple in LoopData.day_summary_records_generator(
+                    dbm, type_earliest_times, day_summary_stats_columns[stats_type]):
+                record_count += 1
+                record_stats = stats_type(stats_tuple)
+                for span_start, stats in targets[obstype]:
+                    if date_time >= span_start:
+                        stats.mergeHiLo(record_stats)
+                        stats.mergeSum(record_stats)
+
+        # Add in today's stats
+        for obstype, obstype_targets in targets.items():
+            for _, stats in obstype_targets:
+                stats.mergeHiLo(day_accum[obstype])
+                stats.mergeSum(day_accum[obstype])
 
-    @staticmethod
-    def create_week_accum(unit_system: int, archive_interval: int, obstypes: Set[str], pkt_time: int,
-            week_start: int, day_accum: weewx.accum.Accum, dbm) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        log.debug('Creating initial week_accum')
-        span = weeutil.weeutil.archiveWeekSpan(pkt_time, week_start)
-        return LoopData.create_period_accum('week', unit_system, archive_interval, obstypes, span, day_accum, dbm)
+        log.debug('Created %s accums in %f seconds (read %d records).', ', '.join(spans), time.monotonic() - start, record_count)
+        return {name: (accum, valid_obstypes[name]) if accum is not None else (None, set())
+            for name, accum in accums.items()}
 
     @staticmethod
     def create_hour_accum(unit_system: int, archive_interval: int, obstypes: Set[str], pkt_time: int, day_accum: weewx.accum.Accum, dbm
             ) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        log.debug('Creating initial hour_accum')
-        span = weeutil.weeutil.archiveHoursAgoSpan(pkt_time)
-        return LoopData.create_period_accum('hour', unit_system, archive_interval, obstypes, span, day_accum, dbm)
-
-    @staticmethod
-    def create_period_accum(name: str, unit_system: int, archive_interval: int, obstypes: Set[str],
-            span: weeutil.weeutil.TimeSpan, day_accum: weewx.accum.Accum, dbm) -> Tuple[Optional[weewx.accum.Accum], Set[str]]:
-        """return period accumulator and (possibly trimmed) obstypes"""
+        """return hour accumulator and (possibly trimmed) obstypes"""
 
         if len(obstypes) == 0:
             return None, set()
 
-        start = time.time()
+        log.debug('Creating initial hour_accum')
+        span = weeutil.weeutil.archiveHoursAgoSpan(pkt_time)
         accum = weewx.accum.Accum(span, unit_system)
 
         # valid observation types will be returned
@@ -1327,81 +1612,30 @@ class LoopData(StdService):
 
         # for each obstype, create the appropriate stats.
         for obstype in obstypes:
-            stats: Optional[Any] = None
             if obstype not in day_accum:
                 # Obstypes implemented with xtypes will fall out here.
                 # As well as typos or any obstype that is not in day_accum.
-                log.info('Ignoring %s for %s time period as this observation has no day accumulator.'
-                    % (obstype, name))
+                log.info('Ignoring %s for hour time period as this observation has no day accumulator.', obstype)
                 continue
             valid_obstypes.add(obstype)
-            if type(day_accum[obstype]) == weewx.accum.ScalarStats:
-                stats = weewx.accum.ScalarStats()
-            elif type(day_accum[obstype]) == weewx.accum.VecStats:
-                stats = weewx.accum.VecStats()
-            elif type(day_accum[obstype]) == weewx.accum.FirstLastAccum:
-                stats = weewx.accum.FirstLastAccum()
-            else:
+            stats_type = type(day_accum[obstype])
+            if stats_type not in day_summary_stats_columns:
                 return None, set()
-            record_count = 0
-            # For periods > day, accumulate from day summary records.
-            # hour accumulator is handled by reading archive records (see below).
-            if  name != 'hour':
-                for record in LoopData.day_summary_records_generator(dbm, obstype, span.start):
-                    record_count += 1
-                    # TODO(jkline): From above, it appears that stats cannot be None.
-                    if stats is None:
-                        # Figure out the stats type
-                        if 'squaresum' in record:
-                            stats = weewx.accum.VecStats()
-                        elif 'wsum' in record:
-                            stats = weewx.accum.ScalarStats()
-                        elif 'last' in record:
-                            stats = weewx.accum.FirstLastAccum()
-                        else:
-                            return None, set()
-                    if type(stats) == weewx.accum.ScalarStats:
-                        sstat = weewx.accum.ScalarStats((record['min'], record['mintime'],
-                            record['max'], record['maxtime'],
-                            record['sum'], record['count'],
-                            record['wsum'], record['sumtime']))
-                        stats.mergeHiLo(sstat)
-                        stats.mergeSum(sstat)
-                    elif type(stats) == weewx.accum.VecStats:
-                        vstat = weewx.accum.VecStats((record['min'], record['mintime'],
-                            record['max'], record['maxtime'],
-                            record['sum'], record['count'],
-                            record['wsum'], record['sumtime'],
-                            record['max_dir'], record['xsum'], record['ysum'],
-                            record['dirsumtime'], record['squaresum'], record['wsquaresum']))
-                        stats.mergeHiLo(vstat)
-                        stats.mergeSum(vstat)
-                    else:  # FirstLastAccum():
-                        fstat = weewx.accum.FirstLastAccum((record['first'], record['firsttime'],
-                            record['last'], record['lasttime']))
-                        stats.mergeHiLo(fstat)
-                        stats.mergeSum(fstat)
-                # Add in today's stats
-                stats.mergeHiLo(day_accum[obstype])
-                stats.mergeSum(day_accum[obstype])
-            accum[obstype] = stats
-
-        if  name == 'hour':
-            # Fetch archive records to prime the hour accumulator.
-            earliest_time = span[0]
-            start = time.time()
-            pkt_count: int = 0
-            archive_columns: List[str] = dbm.connection.columnsOf('archive')
-            archive_pkts: List[Dict[str, Any]] = LoopData.get_archive_packets(
-                dbm, archive_columns, earliest_time)
-            for pkt in archive_pkts:
-                pkt['usUnits'] = unit_system
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, obstypes)
-                accum.addRecord(pruned_pkt, weight=archive_interval * 60)
-                pkt_count += 1
-            log.debug('Primed hour_accum with %d archive packets in %f seconds.' % (pkt_count, time.time() - start))
-
-        log.debug('Created %s accum in %f seconds (read %d records).' % (name, time.time() - start, record_count))
+            accum[obstype] = stats_type()
+
+        # Fetch archive records to prime the hour accumulator.
+        start = time.monotonic()
+        pkt_count: int = 0
+        archive_columns: List[str] = dbm.connection.columnsOf('archive')
+        # get_archive_packets only selects the columns in obstypes, so the packets
+        # need no pruning.
+        add_record = accum.addRecord
+        weight: int = archive_interval * 60
+        for pkt in LoopData.get_archive_packets(dbm, archive_columns, span.start, obstypes):
+            pkt['usUnits'] = unit_system
+            add_record(pkt, weight=weight)
+            pkt_count += 1
+        log.debug('Primed hour_accum with %d archive packets in %f seconds.', pkt_count, time.monotonic() - start)
         return accum, valid_obstypes
 
     @staticmethod
@@ -1419,268 +1653,304 @@ class LoopData(StdService):
 
         # for each obstype, create the appropriate stats.
         for obstype in obstypes:
-            stats: Optional[Any] = None
             if obstype not in day_accum:
                 # Obstypes implemented with xtypes will fall out here.
                 # As well as typos or any obstype that is not in day_accum.
-                log.info('Ignoring %s for %s time period as this observation has no day accumulator.'
-                    % (obstype, name))
+                log.info('Ignoring %s for %s time period as this observation has no day accumulator.',
+                    obstype, name)
                 continue
             valid_obstypes.add(obstype)
-            if type(day_accum[obstype]) == weewx.accum.ScalarStats:
-                stats = ContinuousScalarStats(timelength)
-            elif type(day_accum[obstype]) == weewx.accum.VecStats:
-                stats = ContinuousVecStats(timelength)
-            elif type(day_accum[obstype]) == weewx.accum.FirstLastAccum:
-                stats = ContinuousFirstLastAccum(timelength)
-            else:
+            continuous_stats_type: Optional[type] = continuous_stats_types.get(type(day_accum[obstype]))
+            if continuous_stats_type is None:
                 return None, set()
-            accum[obstype] = stats
+            accum[obstype] = continuous_stats_type(timelength)
 
         # Fetch archive records to prime the accumulator.
-        start = time.time()
-        earliest_time = start - timelength
+        start = time.monotonic()
+        earliest_time = time.time() - timelength
         pkt_count: int = 0
         archive_columns: List[str] = dbm.connection.columnsOf('archive')
-        archive_pkts: List[Dict[str, Any]] = LoopData.get_archive_packets(
-            dbm, archive_columns, earliest_time)
-        for pkt in archive_pkts:
+        # get_archive_packets only selects the columns in obstypes, so the packets
+        # need no pruning.
+        add_record = accum.addRecord
+        weight: int = archive_interval * 60
+        for pkt in LoopData.get_archive_packets(dbm, archive_columns, earliest_time, obstypes):
             pkt['usUnits'] = unit_system
-            pruned_pkt = LoopProcessor.prune_period_packet(pkt, obstypes)
-            accum.addRecord(pruned_pkt, weight=archive_interval * 60)
+            add_record(pkt, weight=weight)
             pkt_count += 1
-        log.debug('Primed ContinousAccum(%s) with %d archive packets in %f seconds.' % (name, pkt_count, time.time() - start))
+        log.debug('Primed ContinousAccum(%s) with %d archive packets in %f seconds.', name, pkt_count, time.monotonic() - start)
 
-        log.debug('Created %s accum in %f seconds (read %d records).' % (name, time.time() - start, pkt_count))
+        log.debug('Created %s accum in %f seconds (read %d records).', name, time.monotonic() - start, pkt_count)
         return accum, valid_obstypes
 
     @staticmethod
     def parse_cname(field: str) -> Optional[CheetahName]:
-        valid_prefixes    : List[str] = [ 'unit' ]
-        valid_prefixes2   : List[str] = [ 'label' ]
-        valid_agg_types   : List[str] = [ 'max', 'min', 'maxtime', 'mintime',
-                                          'gustdir', 'avg', 'sum', 'vecavg',
-                                          'vecdir', 'rms' ]
-        valid_format_specs: List[str] = [ 'formatted', 'raw', 'ordinal_compass',
-                                          'desc', 'code' ]
-
-        segment: List[str] = field.split('.')
-        if len(segment) < 2:
+        m = cname_pattern.fullmatch(field)
+        if m is None:
             return None
 
-        next_seg = 0
-
-        prefix = None
-        prefix2 = None
-        if segment[next_seg] in valid_prefixes:
-            prefix = segment[next_seg]
-            next_seg += 1
-            if segment[next_seg] in valid_prefixes2:
-                prefix2 = segment[next_seg]
-                next_seg += 1
-            else:
-                return None
-
-        period = None
-        if prefix is None: # All but $unit must have a period.
-            if len(segment) < next_seg:
-                return None
-            if LoopData.is_valid_period(segment[next_seg]):
-                period = segment[next_seg]
-                next_seg += 1
-            else:
-                return None
-
-        if len(segment) < next_seg:
-            # need an obstype, but none there
+        if m.group('prefix') is not None:
+            return CheetahName(
+                field       = field,
+                prefix      = m.group('prefix'),
+                prefix2     = m.group('prefix2'),
+                period      = None,
+                obstype     = m.group('unit_obstype'),
+                agg_type    = None,
+                format_spec = None)
+
+        period: str = m.group('period')
+        if not LoopData.is_valid_period(period):
             return None
-        obstype = segment[next_seg]
-        next_seg += 1
 
-        agg_type = None
+        obstype: str = m.group('obstype')
+        agg_type: Optional[str] = m.group('agg_type')
         # all periods, except current and trend, must have an agg_type
-        if period is not None and period != 'current' and period != 'trend':
-            if len(segment) <= next_seg:
-                return None
-            if segment[next_seg] not in valid_agg_types:
-                return None
-            agg_type = segment[next_seg]
-            next_seg += 1
-
-        format_spec = None
-        # check for a format spec
-        if prefix is None and len(segment) > next_seg:
-            if segment[next_seg] in valid_format_specs:
-                format_spec = segment[next_seg]
-                next_seg += 1
-
-        # windrun_<dir> is not supported for week, month, year, rainyear and alltime
-        if obstype.startswith('windrun_') and (
-                period == 'week' or period == 'month' or period == 'year' or period == 'rainyear' or period == 'alltime'):
+        if (agg_type is None) != (period == 'current' or period == 'trend'):
             return None
 
-        if len(segment) > next_seg:
-            # There is more.  This is unexpected.
+        # windrun_<dir> is not supported for week, month, year, rainyear and alltime
+        if obstype.startswith('windrun_') and period in windrun_bucket_unsupported_periods:
             return None
 
         return CheetahName(
             field       = field,
-            prefix      = prefix,
-            prefix2     = prefix2,
+            prefix      = None,
+            prefix2     = None,
             period      = period,
             obstype     = obstype,
             agg_type    = agg_type,
-            format_spec = format_spec)
+            format_spec = m.group('format_spec'))
 
 class LoopProcessor:
     def __init__(self, cfg: Configuration):
         self.cfg = cfg
         self.archive_start: float = time.time()
+        # Holds the latest loopdata packet to be written.  If the writer falls
+        # behind, a pending (stale) packet is replaced with the new one.
+        self.write_queue: queue.Queue = queue.Queue(maxsize=1)
+        # The contents last written to loop-data.txt.  When the formatted values don't
+        # change between loop packets (common on a quiet night), there is no need to
+        # write the same file again.
+        self.last_written: Optional[Dict[str, Any]] = None
 
     def process_queue(self) -> None:
         try:
             while True:
-                event               = self.cfg.queue.get()
+                self.process_events(self.drain_queue())
+        except Exception:
+            weeutil.logger.log_traceback(log.critical, "    ****  ")
+            raise
 
-                if type(event) == Accumulators:
-                    LoopProcessor.log_configuration(self.cfg)
-                    self.accumulators: Accumulators = event
-                    continue
+    def drain_queue(self) -> List[Any]:
+        """Block for the next event, then grab any others that are already waiting."""
+        events: List[Any] = [self.cfg.queue.get()]
+        while True:
+            try:
+                events.append(self.cfg.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def process_events(self, events: List[Any]) -> None:
+        # Index of the newest loop packet in this batch.  Older loop packets
+        # still go into the accumulators, but there is no point in creating
+        # (and writing) loopdata packets for them.
+        last_loop = max((i for i, event in enumerate(events) if type(event) is not Accumulators), default=-1)
+        for i, event in enumerate(events):
+            if type(event) is Accumulators:
+                LoopProcessor.log_configuration(self.cfg)
+                self.accumulators: Accumulators = event
+                continue
+            self.process_loop_event(event, i == last_loop)
+
+    def process_loop_event(self, event: weewx.Event, write: bool) -> None:
+        assert event.event_type == weewx.NEW_LOOP_PACKET
+
+        pkt: Dict[str, Any] = event.packet
+        pkt_time: int       = to_int(pkt['dateTime'])
+        pkt['interval']     = self.cfg.loop_frequency / 60.0
 
-                # This is a loop packet.
-                assert event.event_type == weewx.NEW_LOOP_PACKET
-
-                pkt: Dict[str, Any] = event.packet
-                pkt_time: int       = to_int(pkt['dateTime'])
-                pkt['interval']     = self.cfg.loop_frequency / 60.0
-
-                log.debug('Dequeued loop event(%s): %s' % (event, timestamp_to_string(pkt_time)))
-                log.debug(pkt)
-
-                try:
-                    windrun_val = weewx.wxxtypes.WXXTypes.calc_windrun('windrun', pkt)
-                    pkt['windrun'] = windrun_val[0]
-                    if windrun_val[0] > 0.00 and 'windDir' in pkt and pkt['windDir'] is not None:
-                        bkt = LoopProcessor.get_windrun_bucket(pkt['windDir'])
-                        pkt['windrun_%s' % windrun_bucket_suffixes[bkt]] = windrun_val[0]
-                except weewx.CannotCalculate:
-                    log.info('Cannot calculate windrun.')
-                    pass
-
-                try:
-                    beaufort_val = weewx.wxxtypes.WXXTypes.calc_beaufort('beaufort', pkt)
-                    pkt['beaufort'] = beaufort_val[0]
-                except weewx.CannotCalculate:
-                    log.info('Cannot calculate beaufort.')
-                    pass
-
-                # Process new packet.
-                loopdata_pkt = LoopProcessor.generate_loopdata_dictionary(pkt, self.cfg, self.accumulators)
-                # Write the loop-data.txt file.
-                LoopProcessor.write_packet_to_file(loopdata_pkt,
-                    self.cfg.tmpname, self.cfg.loop_data_dir, self.cfg.filename)
-                if self.cfg.enable:
-                    # Rsync the loop-data.txt file.
-                    LoopProcessor.rsync_data(pkt_time,
-                        self.cfg.skip_if_older_than, self.cfg.loop_data_dir,
-                        self.cfg.filename, self.cfg.remote_dir,
-                        self.cfg.remote_server, self.cfg.remote_port,
-                        self.cfg.timeout, self.cfg.remote_user,
-                        self.cfg.ssh_options, self.cfg.compress,
-                        self.cfg.log_success)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Dequeued loop event(%s): %s', event, timestamp_to_string(pkt_time))
+            log.debug(pkt)
+
+        LoopProcessor.add_windrun_and_beaufort(pkt, self.cfg.obstypes.current)
+
+        # Process new packet.
+        converted_pkt = LoopProcessor.add_packet_to_accumulators(pkt, self.cfg, self.accumulators)
+        # If a newer loop packet is already waiting, don't bother creating
+        # (and writing) a loopdata packet for this one.
+        if not write:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Skipping loopdata packet for superseded loop packet (%s).', timestamp_to_string(pkt_time))
+            return
+        loopdata_pkt = LoopProcessor.create_loopdata_packet(converted_pkt, self.cfg, self.accumulators)
+        # Hand off to the writer thread.
+        self.queue_write(loopdata_pkt, pkt_time)
+
+    def queue_write(self, loopdata_pkt: Dict[str, Any], pkt_time: int) -> None:
+        # loop-data.txt is the latest state, not a log; if the writer has not
+        # yet picked up the previous packet, drop it in favor of this one.
+        try:
+            self.write_queue.put_nowait((loopdata_pkt, pkt_time))
+        except queue.Full:
+            try:
+                self.write_queue.get_nowait()
+                log.debug('Writer behind, dropped stale loopdata packet.')
+            except queue.Empty:
+                pass
+            self.write_queue.put_nowait((loopdata_pkt, pkt_time))
+
+    def process_write_queue(self) -> None:
+        try:
+            while True:
+                loopdata_pkt, pkt_time = self.write_queue.get()
+                self.write_and_upload(loopdata_pkt, pkt_time)
         except Exception:
             weeutil.logger.log_traceback(log.critical, "    ****  ")
             raise
         finally:
-            os.unlink(self.cfg.tmpname)
+            # Only this thread writes tmpname; don't leave a partial write behind.
+            if os.path.exists(self.cfg.tmpname):
+                os.unlink(self.cfg.tmpname)
+
+    def write_and_upload(self, loopdata_pkt: Dict[str, Any], pkt_time: int) -> None:
+        if loopdata_pkt != self.last_written:
+            # Write the loop-data.txt file.
+            LoopProcessor.write_packet_to_file(loopdata_pkt,
+                self.cfg.tmpname, self.cfg.local_path, self.cfg.sync_on_write)
+            self.last_written = loopdata_pkt
+        else:
+            log.debug('loopdata packet unchanged, not rewriting %s.', self.cfg.local_path)
+        if self.cfg.enable:
+            # Rsync the loop-data.txt file (even if unchanged).  rsync's quick check finds
+            # an unmodified file already up to date, unless an earlier upload failed.
+            # enable is only left on when remote_dir (and hence remote_path) is set.
+            assert self.cfg.remote_path is not None
+            LoopProcessor.rsync_data(pkt_time,
+                self.cfg.skip_if_older_than, self.cfg.local_path,
+                self.cfg.remote_path,
+                self.cfg.remote_server, self.cfg.remote_port,
+                self.cfg.timeout, self.cfg.remote_user,
+                self.cfg.ssh_options, self.cfg.compress,
+                self.cfg.log_success)
 
     @staticmethod
     def generate_loopdata_dictionary(in_pkt: Dict[str, Any], cfg: Configuration, accums: Accumulators) -> Dict[str, Any]:
+        pkt = LoopProcessor.add_packet_to_accumulators(in_pkt, cfg, accums)
+        # Create the loopdata dictionary.
+        return LoopProcessor.create_loopdata_packet(pkt, cfg, accums)
+
+    @staticmethod
+    def add_packet_to_accumulators(in_pkt: Dict[str, Any], cfg: Configuration, accums: Accumulators) -> Dict[str, Any]:
+        """Add the packet to all accumulators, returns the packet converted to cfg.unit_system."""
 
         # pkt needs to be in the units that the accumulators are expecting.
         pruned_pkt = LoopProcessor.prune_period_packet(in_pkt, cfg.obstypes.current)
-        pkt = weewx.units.StdUnitConverters[cfg.unit_system].convertDict(pruned_pkt)
-        pkt['usUnits'] = cfg.unit_system
+        if pruned_pkt['usUnits'] == cfg.unit_system:
+            # Already in the accumulators' units (the usual case), nothing to convert.
+            pkt = pruned_pkt
+        else:
+            pkt = LoopProcessor.convert_packet(pruned_pkt, cfg.unit_system)
+            pkt['usUnits'] = cfg.unit_system
+
+        # Rather than relying on addRecord raising OutOfSpan, check for a span rollover
+        # explicitly before adding to each period accumulator.
+        ts = pkt['dateTime']
+        # Periods using every current obstype are passed pkt as is (accumulators do
+        # not modify the records added to them).
+        covers_current = cfg.obstypes.covers_current
 
         # Add packet to alltime accumulator.
-        # There will never be an OutOfSpan exception.
+        # The alltime span never rolls over.
         if len(cfg.obstypes.alltime) > 0 and accums.alltime_accum is not None:
-            pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.alltime)
+            pruned_pkt = pkt if covers_current['alltime'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.alltime)
             accums.alltime_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packet to rainyear accumulator.
-        try:
-            if len(cfg.obstypes.rainyear) > 0 and accums.rainyear_accum is not None:
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.rainyear)
-                accums.rainyear_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
-        except weewx.accum.OutOfSpan:
-            timespan = weeutil.weeutil.archiveRainYearSpan(pkt['dateTime'], cfg.rainyear_start)
-            accums.rainyear_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
-            # Try again:
-            accums.rainyear_accum.addRecord(pkt, weight=cfg.loop_frequency)
+        if len(cfg.obstypes.rainyear) > 0 and accums.rainyear_accum is not None:
+            if not accums.rainyear_accum.timespan.includesArchiveTime(ts):
+                # The rainyear has rolled over, start a new accumulator.
+                timespan = weeutil.weeutil.archiveRainYearSpan(ts, cfg.rainyear_start)
+                accums.rainyear_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
+            pruned_pkt = pkt if covers_current['rainyear'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.rainyear)
+            accums.rainyear_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packet to year accumulator.
-        try:
-            if len(cfg.obstypes.year) > 0 and accums.year_accum is not None:
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.year)
-                accums.year_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
-        except weewx.accum.OutOfSpan:
-            timespan = weeutil.weeutil.archiveYearSpan(pkt['dateTime'])
-            accums.year_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
-            # Try again:
-            accums.year_accum.addRecord(pkt, weight=cfg.loop_frequency)
+        if len(cfg.obstypes.year) > 0 and accums.year_accum is not None:
+            if not accums.year_accum.timespan.includesArchiveTime(ts):
+                # The year has rolled over, start a new accumulator.
+                timespan = weeutil.weeutil.archiveYearSpan(ts)
+                accums.year_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
+            pruned_pkt = pkt if covers_current['year'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.year)
+            accums.year_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packet to month accumulator.
-        try:
-            if len(cfg.obstypes.month) > 0 and accums.month_accum is not None:
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.month)
-                accums.month_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
-        except weewx.accum.OutOfSpan:
-            timespan = weeutil.weeutil.archiveMonthSpan(pkt['dateTime'])
-            accums.month_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
-            # Try again:
-            accums.month_accum.addRecord(pkt, weight=cfg.loop_frequency)
+        if len(cfg.obstypes.month) > 0 and accums.month_accum is not None:
+            if not accums.month_accum.timespan.includesArchiveTime(ts):
+                # The month has rolled over, start a new accumulator.
+                timespan = weeutil.weeutil.archiveMonthSpan(ts)
+                accums.month_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
+            pruned_pkt = pkt if covers_current['month'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.month)
+            accums.month_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packet to week accumulator.
-        try:
-            if len(cfg.obstypes.week) > 0 and accums.week_accum is not None:
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.week)
-                accums.week_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
-        except weewx.accum.OutOfSpan:
-            timespan = weeutil.weeutil.archiveWeekSpan(pkt['dateTime'], cfg.week_start)
-            accums.week_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
-            # Try again:
-            accums.week_accum.addRecord(pkt, weight=cfg.loop_frequency)
+        if len(cfg.obstypes.week) > 0 and accums.week_accum is not None:
+            if not accums.week_accum.timespan.includesArchiveTime(ts):
+                # The week has rolled over, start a new accumulator.
+                timespan = weeutil.weeutil.archiveWeekSpan(ts, cfg.week_start)
+                accums.week_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
+            pruned_pkt = pkt if covers_current['week'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.week)
+            accums.week_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packet to day accumulator.
-        try:
-            if len(cfg.obstypes.day) > 0:
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.day)
-                accums.day_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
-        except weewx.accum.OutOfSpan:
-            timespan = weeutil.weeutil.archiveDaySpan(pkt['dateTime'])
-            accums.day_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
-            # Try again:
-            accums.day_accum.addRecord(pkt, weight=cfg.loop_frequency)
+        if len(cfg.obstypes.day) > 0:
+            if not accums.day_accum.timespan.includesArchiveTime(ts):
+                # The day has rolled over, start a new accumulator.
+                timespan = weeutil.weeutil.archiveDaySpan(ts)
+                accums.day_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
+            pruned_pkt = pkt if covers_current['day'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.day)
+            accums.day_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packet to hour accumulator.
-        try:
-            if accums.hour_accum is not None:
-                pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.hour)
-                accums.hour_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
-        except weewx.accum.OutOfSpan:
-            timespan = weeutil.weeutil.archiveHoursAgoSpan(pkt['dateTime'])
-            accums.hour_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
-            # Try again:
-            accums.hour_accum.addRecord(pkt, weight=cfg.loop_frequency)
+        if accums.hour_accum is not None:
+            if not accums.hour_accum.timespan.includesArchiveTime(ts):
+                # The hour has rolled over, start a new accumulator.
+                timespan = weeutil.weeutil.archiveHoursAgoSpan(ts)
+                accums.hour_accum = weewx.accum.Accum(timespan, unit_system=cfg.unit_system)
+            pruned_pkt = pkt if covers_current['hour'] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.hour)
+            accums.hour_accum.addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
         # Add packets to continuous accumulators.
         for per, accum in accums.continuous.items():
-            pruned_pkt = LoopProcessor.prune_period_packet(pkt, cfg.obstypes.continuous[per])
+            pruned_pkt = pkt if covers_current[per] else LoopProcessor.prune_period_packet(pkt, cfg.obstypes.continuous[per])
             accums.continuous[per].addRecord(pruned_pkt, weight=cfg.loop_frequency)
 
-        # Create the loopdata dictionary.
-        return LoopProcessor.create_loopdata_packet(pkt, cfg, accums)
+        return pkt
+
+    @staticmethod
+    def add_windrun_and_beaufort(pkt: Dict[str, Any], current_obstypes: Set[str]) -> None:
+        """Add windrun (and windrun_<dir>) and beaufort to the loop packet, but only if
+           they are needed (i.e., in current_obstypes)."""
+        if not current_obstypes.isdisjoint(windrun_obstypes):
+            try:
+                windrun = weewx.wxxtypes.WXXTypes.calc_windrun('windrun', pkt)[0]
+                pkt['windrun'] = windrun
+                if windrun is not None and windrun > 0.00 and pkt.get('windDir') is not None:
+                    bkt = LoopProcessor.get_windrun_bucket(pkt['windDir'])
+                    pkt[windrun_bucket_obstypes[bkt]] = windrun
+            except weewx.CannotCalculate:
+                log.info('Cannot calculate windrun.')
+
+        if 'beaufort' in current_obstypes:
+            try:
+                pkt['beaufort'] = weewx.wxxtypes.WXXTypes.calc_beaufort('beaufort', pkt)[0]
+            except weewx.CannotCalculate:
+                log.info('Cannot calculate beaufort.')
+
+    @staticmethod
+    def is_stale(pkt_time: int, skip_if_older_than: int) -> bool:
+        return skip_if_older_than != 0 and time.time() - pkt_time > skip_if_older_than
 
     @staticmethod
     def add_unit_obstype(cname: CheetahName, loopdata_pkt: Dict[str, Any],
@@ -1699,14 +1969,14 @@ class LoopProcessor:
             formatter: weewx.units.Formatter) -> None:
 
         if cname.obstype not in pkt:
-            log.debug('%s not found in packet, skipping %s' % (cname.obstype, cname.field))
+            log.debug('%s not found in packet, skipping %s', cname.obstype, cname.field)
             return
 
         value, unit_type, group_type = LoopProcessor.convert_current_obs(
                 converter, cname.obstype, pkt)
 
         if value is None:
-            log.debug('%s not found in loop packet.' % cname.field)
+            log.debug('%s not found in loop packet.', cname.field)
             return
 
         if cname.format_spec == 'ordinal_compass':
@@ -1719,14 +1989,14 @@ class LoopProcessor:
             try:
                 loopdata_pkt[cname.field] = fmt_str % value
             except Exception as e:
-                log.debug('%s: %s, %s, %s' % (e, cname.field, fmt_str, value))
+                log.debug('%s: %s, %s, %s', e, cname.field, fmt_str, value)
             return
 
         if cname.format_spec == 'raw':
             loopdata_pkt[cname.field] = value
             return
 
-        if type(value) == str:
+        if type(value) is str:
             loopdata_pkt[cname.field] = value
         else:
             loopdata_pkt[cname.field] = formatter.toString((value, unit_type, group_type))
@@ -1735,67 +2005,37 @@ class LoopProcessor:
     def add_period_obstype(cname: CheetahName, period_accum: Union[weewx.accum.Accum, ContinuousAccum],
             loopdata_pkt: Dict[str, Any], converter: weewx.units.Converter,
             formatter: weewx.units.Formatter) -> None:
-        if cname.obstype not in period_accum:
-            log.debug('No %s stats for %s, skipping %s' % (cname.period, cname.obstype, cname.field))
+        stats = period_accum.get(cname.obstype)
+        if stats is None:
+            log.debug('No %s stats for %s, skipping %s', cname.period, cname.obstype, cname.field)
             return
 
-        stats = period_accum[cname.obstype]
-
-        if (isinstance(stats, weewx.accum.ScalarStats) or isinstance(stats, ContinuousScalarStats))  and stats.lasttime is not None:
-            min, mintime, max, maxtime, sum, count, wsum, sumtime = stats.getStatsTuple()
-            if cname.agg_type == 'min':
-                src_value = min
-            elif cname.agg_type == 'mintime':
-                src_value = mintime
-            elif cname.agg_type == 'max':
-                src_value = max
-            elif cname.agg_type == 'maxtime':
-                src_value = maxtime
-            elif cname.agg_type == 'sum':
-                src_value = sum
-            elif cname.agg_type == 'avg':
-                src_value = stats.avg
-            else:
-                return
-
-        elif (isinstance(stats, weewx.accum.VecStats) or isinstance(stats, ContinuousVecStats)) and stats.count != 0:
-            min, mintime, max, maxtime, sum, count, wsum, sumtime, max_dir, xsum, ysum, dirsumtime, squaresum, wsquaresum = stats.getStatsTuple()
-            if cname.agg_type == 'maxtime':
-                src_value = maxtime
-            elif cname.agg_type == 'max':
-                src_value = max
-            elif cname.agg_type == 'gustdir':
-                src_value = max_dir
-            elif cname.agg_type == 'mintime':
-                src_value = mintime
-            elif cname.agg_type == 'min':
-                src_value = min
-            elif cname.agg_type == 'count':
-                src_value = count
-            elif cname.agg_type == 'avg':
-                src_value = stats.avg
-            elif cname.agg_type == 'sum':
-                src_value = stats.sum
-            elif cname.agg_type == 'rms':
-                src_value = stats.rms
-            elif cname.agg_type == 'vecavg':
-                src_value = stats.vec_avg
-            elif cname.agg_type == 'vecdir':
-                src_value = stats.vec_dir
-            else:
+        handler = period_stats_handlers.get(type(stats))
+        if handler is None:
+            # Not an exact match; accept subclasses of the supported stats types.
+            handler = next((h for t, h in period_stats_handlers.items() if isinstance(stats, t)), None)
+            if handler is None:
+                # firstlast not currently supported
                 return
+        has_data, agg_getters = handler
+        if not has_data(stats):
+            return
 
-        else:
-            # firstlast not currently supported
+        # All period fields (other than current and trend) have an agg_type.
+        assert cname.agg_type is not None
+        agg_getter = agg_getters.get(cname.agg_type)
+        if agg_getter is None:
             return
+        src_value = agg_getter(stats)
 
         if src_value is None:
-            log.debug('Currently no %s stats for %s.' % (cname.period, cname.field))
+            log.debug('Currently no %s stats for %s.', cname.period, cname.field)
             return
 
-        src_type, src_group = weewx.units.getStandardUnitType(period_accum.unit_system, cname.obstype, agg_type=cname.agg_type)
-
-        tgt_value, tgt_type, tgt_group = converter.convert((src_value, src_type, src_group))
+        field_conversion = LoopProcessor.get_field_conversion(
+            converter, period_accum.unit_system, cname.obstype, cname.agg_type)
+        tgt_type, tgt_group = field_conversion.tgt_type, field_conversion.tgt_group
+        tgt_value = src_value if field_conversion.conversion is None else field_conversion.conversion(src_value)
 
         if cname.format_spec == 'ordinal_compass':
             loopdata_pkt[cname.field] = formatter.to_ordinal_compass(
@@ -1807,7 +2047,7 @@ class LoopProcessor:
             try:
                 loopdata_pkt[cname.field] = fmt_str % tgt_value
             except Exception as e:
-                log.debug('%s: %s, %s, %s' % (e, cname.field, fmt_str, tgt_value))
+                log.debug('%s: %s, %s, %s', e, cname.field, fmt_str, tgt_value)
             return
 
         if cname.format_spec == 'raw':
@@ -1823,12 +2063,12 @@ class LoopProcessor:
             formatter: weewx.units.Formatter) -> None:
 
         if cname.obstype not in accum:
-            log.debug('No %s stats for %s, skipping %s' % (cname.period, cname.obstype, cname.field))
+            log.debug('No %s stats for %s, skipping %s', cname.period, cname.obstype, cname.field)
             return
 
         value, unit_type, group_type = LoopProcessor.get_trend(cname, pkt, accum, converter, time_delta, loop_frequency)
         if value is None:
-            log.debug('add_trend_obstype: %s: get_trend returned None.' % cname.field)
+            log.debug('add_trend_obstype: %s: get_trend returned None.', cname.field)
             return
 
         if cname.obstype == 'barometer' and (cname.format_spec == 'code' or cname.format_spec == 'desc'):
@@ -1847,7 +2087,7 @@ class LoopProcessor:
             try:
                 loopdata_pkt[cname.field] = fmt_str % value
             except Exception as e:
-                log.debug('%s: %s, %s, %s' % (e, cname.field, fmt_str, value))
+                log.debug('%s: %s, %s, %s', e, cname.field, fmt_str, value)
             return
 
         if cname.format_spec == 'raw':
@@ -1857,137 +2097,190 @@ class LoopProcessor:
         loopdata_pkt[cname.field] = formatter.toString((value, unit_type, group_type))
 
 
+    @staticmethod
+    def convert_packet(pkt: Dict[str, Any], unit_system: int) -> Dict[str, Any]:
+        """Same as StdUnitConverters[unit_system].convertDict(pkt), but the conversion
+           function for each obstype is looked up once (and cached in unit_conversions)."""
+        src_unit_system: int = pkt['usUnits']
+        conversions = unit_conversions.get((src_unit_system, unit_system))
+        if conversions is None:
+            conversions = unit_conversions[(src_unit_system, unit_system)] = {}
+        converted_pkt: Dict[str, Any] = {}
+        for obstype, value in pkt.items():
+            if obstype == 'usUnits':
+                continue
+            try:
+                conversion = conversions[obstype]
+            except KeyError:
+                conversion = LoopProcessor.get_unit_conversion(src_unit_system, unit_system, obstype)
+                conversions[obstype] = conversion
+            converted_pkt[obstype] = value if conversion is None or value is None else conversion(value)
+        return converted_pkt
+
+    @staticmethod
+    def get_unit_conversion(src_unit_system: int, unit_system: int, obstype: str
+            ) -> Optional[Callable[[Any], Any]]:
+        """Return the function converting obstype from src_unit_system to unit_system,
+           or None if no conversion is needed.  Raises KeyError (as weewx.units.convert
+           does) if the conversion is unknown."""
+        src_unit, unit_group = weewx.units.StdUnitConverters[src_unit_system].getTargetUnit(obstype)
+        if src_unit is None and unit_group is None:
+            return None
+        tgt_unit = weewx.units.StdUnitConverters[unit_system].group_unit_dict.get(
+            unit_group, weewx.units.USUnits[unit_group])
+        if src_unit == tgt_unit:
+            return None
+        return weewx.units.conversionDict[src_unit][tgt_unit]
+
+    @staticmethod
+    def get_field_conversion(converter: weewx.units.Converter, unit_system: int, obstype: str,
+            agg_type: Optional[str]) -> FieldConversion:
+        """Return (and cache in field_conversions) the units and the conversion function
+           converter.convert would use for obstype (with agg_type) in unit_system."""
+        key: Tuple[weewx.units.Converter, int, str, Optional[str]] = (converter, unit_system, obstype, agg_type)
+        field_conversion: Optional[FieldConversion] = field_conversions.get(key)
+        if field_conversion is None:
+            src_type, src_group = weewx.units.getStandardUnitType(unit_system, obstype, agg_type=agg_type)
+            if src_type is None and src_group is None:
+                field_conversion = FieldConversion(None, None, None, None, None)
+            else:
+                tgt_type = converter.group_unit_dict.get(src_group, weewx.units.USUnits[src_group])
+                conversion = None if tgt_type == src_type else weewx.units.conversionDict[src_type][tgt_type]
+                field_conversion = FieldConversion(src_type, src_group, tgt_type, src_group, conversion)
+            field_conversions[key] = field_conversion
+        return field_conversion
+
     @staticmethod
     def convert_current_obs(converter: weewx.units.Converter, obstype: str,
             pkt: Dict[str, Any]) -> Tuple[Any, Any, Any]:
-        """ Returns value, format_str, label_str """
+        """ Returns value, unit_type, group_type """
 
-        v_t = weewx.units.as_value_tuple(pkt, obstype)
-        _, original_unit_type, original_group_type = v_t
-        value, unit_type, group_type = converter.convert(v_t)
+        field_conversion = LoopProcessor.get_field_conversion(converter, pkt['usUnits'], obstype, None)
+        value = pkt[obstype]
+        if value is not None and field_conversion.conversion is not None:
+            value = field_conversion.conversion(value)
 
-        return value, unit_type, group_type
+        return value, field_conversion.tgt_type, field_conversion.tgt_group
 
     @staticmethod
     def create_loopdata_packet(pkt: Dict[str, Any], cfg: Configuration, accums: Accumulators) -> Dict[str, Any]:
 
         loopdata_pkt: Dict[str, Any] = {}
 
-        # Iterate through fields.
-        for cname in cfg.fields_to_include:
-            if cname is None:
-                continue
-            if cname.prefix == 'unit':
-                LoopProcessor.add_unit_obstype(cname, loopdata_pkt, cfg.converter, cfg.formatter)
+        # Bind the adders and config to locals, they are used for every field.
+        add_unit_obstype    = LoopProcessor.add_unit_obstype
+        add_current_obstype = LoopProcessor.add_current_obstype
+        add_period_obstype  = LoopProcessor.add_period_obstype
+        add_trend_obstype   = LoopProcessor.add_trend_obstype
+        converter           = cfg.converter
+        formatter           = cfg.formatter
+
+        # Iterate through fields, a period at a time.
+        for period, cnames in cfg.fields_by_period.items():
+            if period == 'unit':
+                for cname in cnames:
+                    add_unit_obstype(cname, loopdata_pkt, converter, formatter)
                 continue
 
-            if cname.period == 'current':
-                LoopProcessor.add_current_obstype(cname, pkt, loopdata_pkt, cfg.converter, cfg.formatter)
+            if period == 'current':
+                for cname in cnames:
+                    add_current_obstype(cname, pkt, loopdata_pkt, converter, formatter)
                 continue
 
-            # fixed periods
-            if cname.period == 'alltime' and accums.alltime_accum is not None:
-                LoopProcessor.add_period_obstype(cname, accums.alltime_accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
-            if cname.period == 'rainyear' and accums.rainyear_accum is not None:
-                LoopProcessor.add_period_obstype(cname, accums.rainyear_accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
-            if cname.period == 'year' and accums.year_accum is not None:
-                LoopProcessor.add_period_obstype(cname, accums.year_accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
-            if cname.period == 'month' and accums.month_accum is not None:
-                LoopProcessor.add_period_obstype(cname, accums.month_accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
-            if cname.period == 'week' and accums.week_accum is not None:
-                LoopProcessor.add_period_obstype(cname, accums.week_accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
-            if cname.period == 'day':
-                LoopProcessor.add_period_obstype(cname, accums.day_accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
-            if cname.period == 'hour' and accums.hour_accum is not None:
-                LoopProcessor.add_period_obstype(cname, accums.hour_accum, loopdata_pkt, cfg.converter, cfg.formatter)
+            if period == 'trend':
+                trend_accum = accums.continuous.get('trend')
+                if trend_accum is not None:
+                    for cname in cnames:
+                        add_trend_obstype(cname, trend_accum, pkt,
+                            loopdata_pkt, cfg.time_delta, cfg.loop_frequency, cfg.baro_trend_descs, converter, formatter)
                 continue
 
-            # continuous periods
-            for per, accum in accums.continuous.items():
-                if cname.period == per:
-                    if per == 'trend':
-                        LoopProcessor.add_trend_obstype(cname, accum, pkt,
-                            loopdata_pkt, cfg.time_delta, cfg.loop_frequency, cfg.baro_trend_descs, cfg.converter, cfg.formatter)
-                    else:
-                        LoopProcessor.add_period_obstype(cname,  accum, loopdata_pkt, cfg.converter, cfg.formatter)
-                continue
+            period_accum: Optional[Union[weewx.accum.Accum, ContinuousAccum]]
+            fixed_period_accum_getter = fixed_period_accum_getters.get(period)
+            if fixed_period_accum_getter is not None:
+                period_accum = fixed_period_accum_getter(accums)
+            else:
+                # continuous periods
+                period_accum = accums.continuous.get(period)
+
+            if period_accum is not None:
+                for cname in cnames:
+                    add_period_obstype(cname, period_accum, loopdata_pkt, converter, formatter)
 
         return loopdata_pkt
 
     @staticmethod
     def write_packet_to_file(selective_pkt: Dict[str, Any], tmpname: str,
-            loop_data_dir: str, filename: str) -> None:
-        log.debug('Writing packet to %s' % tmpname)
-        with open(tmpname, "w") as f:
-            f.write(json.dumps(selective_pkt))
-            f.flush()
-            os.fsync(f.fileno())
-        log.debug('Wrote to %s' % tmpname)
-        # move it to filename
-        shutil.move(tmpname, os.path.join(loop_data_dir, filename))
-        log.debug('Moved to %s' % os.path.join(loop_data_dir, filename))
+            local_path: str, sync_on_write: bool) -> None:
+        log.debug('Writing packet to %s', tmpname)
+        with open(tmpname, "wb") as f:
+            f.write(encode_json(selective_pkt))
+            if sync_on_write:
+                f.flush()
+                sync_file_data(f.fileno())
+        log.debug('Wrote to %s', tmpname)
+        # move it to local_path (tmpname is in loop_data_dir, so this is an atomic rename)
+        os.replace(tmpname, local_path)
+        log.debug('Moved to %s', local_path)
 
     @staticmethod
     def log_configuration(cfg: Configuration) -> None:
         # queue
         # config_dict
-        log.info('unit_system             : %d' % cfg.unit_system)
-        log.info('archive_interval        : %d' % cfg.archive_interval)
-        log.info('loop_data_dir           : %s' % cfg.loop_data_dir)
-        log.info('filename                : %s' % cfg.filename)
-        log.info('target_report           : %s' % cfg.target_report)
-        log.info('loop_frequency          : %s' % cfg.loop_frequency)
-        log.info('specified_fields        : %s' % cfg.specified_fields)
+        log.info('unit_system             : %d', cfg.unit_system)
+        log.info('archive_interval        : %d', cfg.archive_interval)
+        log.info('loop_data_dir           : %s', cfg.loop_data_dir)
+        log.info('filename                : %s', cfg.filename)
+        log.info('local_path              : %s', cfg.local_path)
+        log.info('target_report           : %s', cfg.target_report)
+        log.info('loop_frequency          : %s', cfg.loop_frequency)
+        log.info('specified_fields        : %s', cfg.specified_fields)
         # fields_to_include
         # formatter
         # converter
-        log.info('tmpname                 : %s' % cfg.tmpname)
-        log.info('enable                  : %d' % cfg.enable)
-        log.info('remote_server           : %s' % cfg.remote_server)
-        log.info('remote_port             : %r' % cfg.remote_port)
-        log.info('remote_user             : %s' % cfg.remote_user)
-        log.info('remote_dir              : %s' % cfg.remote_dir)
-        log.info('compress                : %d' % cfg.compress)
-        log.info('log_success             : %d' % cfg.log_success)
-        log.info('ssh_options             : %s' % cfg.ssh_options)
-        log.info('timeout                 : %d' % cfg.timeout)
-        log.info('skip_if_older_than      : %d' % cfg.skip_if_older_than)
-        log.info('time_delta              : %d' % cfg.time_delta)
-        log.info('week_start              : %d' % cfg.week_start)
-        log.info('rainyear_start          : %d' % cfg.rainyear_start)
-        log.info('obstypes.current        : %s' % cfg.obstypes.current)
-        log.info('obstypes.alltime        : %s' % cfg.obstypes.alltime)
-        log.info('obstypes.rainyear       : %s' % cfg.obstypes.rainyear)
-        log.info('obstypes.year           : %s' % cfg.obstypes.year)
-        log.info('obstypes.month          : %s' % cfg.obstypes.month)
-        log.info('obstypes.week           : %s' % cfg.obstypes.week)
-        log.info('obstypes.day            : %s' % cfg.obstypes.day)
-        log.info('obstypes.hour           : %s' % cfg.obstypes.hour)
+        log.info('tmpname                 : %s', cfg.tmpname)
+        log.info('sync_on_write           : %d', cfg.sync_on_write)
+        log.info('enable                  : %d', cfg.enable)
+        log.info('remote_server           : %s', cfg.remote_server)
+        log.info('remote_port             : %r', cfg.remote_port)
+        log.info('remote_user             : %s', cfg.remote_user)
+        log.info('remote_dir              : %s', cfg.remote_dir)
+        log.info('remote_path             : %s', cfg.remote_path)
+        log.info('compress                : %d', cfg.compress)
+        log.info('log_success             : %d', cfg.log_success)
+        log.info('ssh_options             : %s', cfg.ssh_options)
+        log.info('reuse_ssh_connection    : %d', cfg.reuse_ssh_connection)
+        log.info('ssh_control_path        : %s', cfg.ssh_control_path)
+        log.info('timeout                 : %d', cfg.timeout)
+        log.info('skip_if_older_than      : %d', cfg.skip_if_older_than)
+        log.info('time_delta              : %d', cfg.time_delta)
+        log.info('week_start              : %d', cfg.week_start)
+        log.info('rainyear_start          : %d', cfg.rainyear_start)
+        log.info('obstypes.current        : %s', cfg.obstypes.current)
+        log.info('obstypes.alltime        : %s', cfg.obstypes.alltime)
+        log.info('obstypes.rainyear       : %s', cfg.obstypes.rainyear)
+        log.info('obstypes.year           : %s', cfg.obstypes.year)
+        log.info('obstypes.month          : %s', cfg.obstypes.month)
+        log.info('obstypes.week           : %s', cfg.obstypes.week)
+        log.info('obstypes.day            : %s', cfg.obstypes.day)
+        log.info('obstypes.hour           : %s', cfg.obstypes.hour)
         for per, obstypes in cfg.obstypes.continuous.items():
-            log.info('obstypes.%s: %s' % (per, obstypes))
-        log.info('baro_trend_descs        : %s' % cfg.baro_trend_descs)
+            log.info('obstypes.%s: %s', per, obstypes)
+        log.info('baro_trend_descs        : %s', cfg.baro_trend_descs)
 
     @staticmethod
-    def rsync_data(pktTime: int, skip_if_older_than: int, loop_data_dir: str,
-            filename: str, remote_dir: str, remote_server: str,
+    def rsync_data(pktTime: int, skip_if_older_than: int, local_path: str,
+            remote_path: str, remote_server: str,
             remote_port: int, timeout: int, remote_user: str, ssh_options: str,
             compress: bool, log_success: bool) -> None:
-        log.debug('rsync_data(%d) start' % pktTime)
+        log.debug('rsync_data(%d) start', pktTime)
         # Don't upload if more than skip_if_older_than seconds behind.
-        if skip_if_older_than != 0:
-            age = time.time() - pktTime
-            if age > skip_if_older_than:
-                log.info('skipping packet (%s) with age: %f' % (timestamp_to_string(pktTime), age))
-                return
+        if LoopProcessor.is_stale(pktTime, skip_if_older_than):
+            log.info('skipping packet (%s) with age: %f', timestamp_to_string(pktTime), time.time() - pktTime)
+            return
         rsync_upload = weeutil.rsyncupload.RsyncUpload(
-            local_root= os.path.join(loop_data_dir, filename),
-            remote_root = os.path.join(remote_dir, filename),
+            local_root= local_path,
+            remote_root = remote_path,
             server=remote_server,
             user=remote_user,
             port=str(remote_port) if remote_port is not None else None,
@@ -2000,7 +2293,7 @@ class LoopProcessor:
             rsync_upload.run()
         except IOError as e:
             (cl, unused_ob, unused_tr) = sys.exc_info()
-            log.error("rsync_data: Caught exception %s: %s" % (cl, e))
+            log.error("rsync_data: Caught exception %s: %s", cl, e)
 
     @staticmethod
     def get_barometer_trend(value, unit_type, group_type, time_delta: int) -> BarometerTrend:
@@ -2012,69 +2305,58 @@ class LoopProcessor:
         # Falling (or rising) very rapidly: More than 6.0mb in 3 hours
 
         # Convert to mbars as that is the standard we have for descriptions.
-        converter = weewx.units.Converter(weewx.units.MetricUnits)
-        delta_mbar, _, _ = converter.convert((value, unit_type, group_type))
-        log.debug('Converted to mbar/h: %f' % delta_mbar)
+        delta_mbar, _, _ = baro_trend_converter.convert((value, unit_type, group_type))
+        log.debug('Converted to mbar/h: %f', delta_mbar)
 
         # Normalize to three hours.
         delta_three_hours = time_delta / 10800.0
         delta_mbar = delta_mbar / delta_three_hours
 
-        if delta_mbar > 6.0:
-            baroTrend = BarometerTrend.RISING_VERY_RAPIDLY
-        elif delta_mbar > 3.5:
-            baroTrend = BarometerTrend.RISING_QUICKLY
-        elif delta_mbar > 1.5:
-            baroTrend = BarometerTrend.RISING
-        elif delta_mbar >= 0.1:
-            baroTrend = BarometerTrend.RISING_SLOWLY
-        elif delta_mbar > -0.1:
-            baroTrend = BarometerTrend.STEADY
-        elif delta_mbar >= -1.5:
-            baroTrend = BarometerTrend.FALLING_SLOWLY
-        elif delta_mbar >= -3.5:
-            baroTrend = BarometerTrend.FALLING
-        elif delta_mbar >= -6.0:
-            baroTrend = BarometerTrend.FALLING_QUICKLY
-        else:
-            baroTrend = BarometerTrend.FALLING_VERY_RAPIDLY
+        idx: int = bisect.bisect_right(baro_trend_thresholds, delta_mbar)
+        if idx > 0 and baro_trend_threshold_exclusive[idx - 1] and delta_mbar == baro_trend_thresholds[idx - 1]:
+            # Exactly on a threshold that must be exceeded.
+            idx -= 1
+        baroTrend = baro_trends[idx]
 
         return baroTrend
 
     @staticmethod
     def get_trend(cname: CheetahName, pkt: Dict[str, Any], accum: ContinuousAccum,
             converter, time_delta: int, loop_frequency: float) -> Tuple[Optional[Any], Optional[str], Optional[str]]:
-        if not cname.obstype in accum:
+        stats = accum.get(cname.obstype)
+        if stats is None:
             return None, None, None
-        first = accum[cname.obstype].first
-        firsttime = accum[cname.obstype].firsttime
-        last = accum[cname.obstype].last
-        lasttime = accum[cname.obstype].lasttime
+        first, firsttime, last, lasttime = stats.first, stats.firsttime, stats.last, stats.lasttime
         if first is None or last is None:
             return None, None, None
         if firsttime == lasttime:
             # Need atleast two readings to get a trend.
             return None, None, None
-        try:
-            # Trend needs to be in report target units.
-            start_value, unit_type, group_type = LoopProcessor.convert_current_obs(
-                converter, cname.obstype, { 'dateTime': firsttime, 'usUnits': pkt['usUnits'], cname.obstype: first })
-            end_value, unit_type, group_type = LoopProcessor.convert_current_obs(
-                converter, cname.obstype, { 'dateTime': lasttime, 'usUnits': pkt['usUnits'], cname.obstype: last })
-
-            log.debug('get_trend: %s: start_value: %s' % (cname.obstype, start_value))
-            log.debug('get_trend: %s: end_value: %s' % (cname.obstype, end_value))
-            if start_value is not None and end_value is not None:
-                trend = end_value - start_value
-                # This may not be over the entire range of time_delta (e.g., new station startup)
-                # Adjust to spread over entire range.
-                actual_time_delta = lasttime - firsttime + loop_frequency
-                adj_trend = time_delta / actual_time_delta * trend
-                log.debug('get_trend: %s: %s unadjusted(%s)' % (cname.obstype, adj_trend, trend))
-                return adj_trend, unit_type, group_type
-        except:
-            # Perhaps not a scalar value
-            log.debug('Could not compute trend for %s' % cname.obstype)
+        if not isinstance(first, (int, float)) or not isinstance(last, (int, float)):
+            # Trend is only computed on scalar values.
+            log.debug('Could not compute trend for %s', cname.obstype)
+            return None, None, None
+        # Trend needs to be in report target units.
+        field_conversion = LoopProcessor.get_field_conversion(converter, pkt['usUnits'], cname.obstype, None)
+        start_value, end_value = first, last
+        if field_conversion.conversion is not None:
+            start_value = field_conversion.conversion(first)
+            end_value   = field_conversion.conversion(last)
+        unit_type, group_type = field_conversion.tgt_type, field_conversion.tgt_group
+
+        debug_enabled = log.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            log.debug('get_trend: %s: start_value: %s', cname.obstype, start_value)
+            log.debug('get_trend: %s: end_value: %s', cname.obstype, end_value)
+        if start_value is not None and end_value is not None:
+            trend = end_value - start_value
+            # This may not be over the entire range of time_delta (e.g., new station startup)
+            # Adjust to spread over entire range.
+            actual_time_delta = lasttime - firsttime + loop_frequency
+            adj_trend = time_delta / actual_time_delta * trend
+            if debug_enabled:
+                log.debug('get_trend: %s: %s unadjusted(%s)', cname.obstype, adj_trend, trend)
+            return adj_trend, unit_type, group_type
 
         return None, None, None
 
@@ -2082,23 +2364,20 @@ class LoopProcessor:
     def prune_period_packet(pkt: Dict[str, Any], in_use_obstypes: Set[str]
             ) -> Dict[str, Any]:
         # Prune to only the observations needed.
-        new_pkt: Dict[str, Any] = {}
+        # Walk whichever of the packet and in_use_obstypes is smaller.
+        new_pkt: Dict[str, Any]
+        if len(pkt) < len(in_use_obstypes):
+            new_pkt = {obstype: value for obstype, value in pkt.items() if obstype in in_use_obstypes}
+        else:
+            new_pkt = {obstype: pkt[obstype] for obstype in in_use_obstypes if obstype in pkt}
         new_pkt['dateTime'] = pkt['dateTime']
         new_pkt['usUnits'] = pkt['usUnits']
         if 'interval' in pkt:
             # Probably not needed.
             new_pkt['interval'] = pkt['interval']
-        for obstype in in_use_obstypes:
-            if obstype in pkt:
-                new_pkt[obstype] = pkt[obstype]
         return new_pkt
 
     @staticmethod
     def get_windrun_bucket(wind_dir: float) -> int:
-        bucket_count = len(windrun_bucket_suffixes)
-        slice_size: float = 360.0 / bucket_count
-        bucket: int = to_int((wind_dir + slice_size / 2.0) / slice_size)
-        if bucket >= bucket_count:
-            bucket = 0
-        log.debug('get_windrun_bucket: wind_dir: %d, bucket: %d' % (wind_dir, bucket))
-        return bucket
+        # Directions that round up to 360 wrap around to bucket 0 (N).
+        return int((wind_dir + windrun_half_slice_size) / windrun_slice_size) % windrun_bucket_count
@@ -5,13 +5,18 @@
 """Test processing packets."""
 
 import configobj
+import json
 import logging
 import os
 import queue
+import tempfile
+import time
 import unittest
+import unittest.mock
 
 import weewx
 import weewx.accum
+import weewx.units
 from weeutil.weeutil import to_int
 from weeutil.weeutil import timestamp_to_string
 
@@ -637,6 +642,20 @@ class ProcessPacketTests(unittest.TestCase):
         self.assertEqual(user.loopdata.LoopData.compose_loop_data_dir(
             config_dict, target_report_dict, {'loop_data_dir':'foobar'}), '/etc/weewx/public_html/weatherboard/foobar')
 
+    def test_compose_ssh_options(self) -> None:
+        self.assertEqual(user.loopdata.LoopData.compose_ssh_options('-o ConnectTimeout=1', '/home/weewx/.ssh/loopdata-%C'),
+            '-o ConnectTimeout=1 -o ControlMaster=auto -o ControlPath=/home/weewx/.ssh/loopdata-%C -o ControlPersist=600')
+
+    def test_compute_covers_current(self) -> None:
+        _, obstypes = user.loopdata.LoopData.get_fields_to_include(
+            {'current.outTemp', 'day.outTemp.max', 'day.barometer.max', '10m.outTemp.max'})
+        self.assertEqual(obstypes.covers_current, {'alltime': False, 'rainyear': False, 'year': False,
+            'month': False, 'week': False, 'day': True, 'hour': False, '10m': False})
+
+        # Trimming a period's obstypes (as new_loop may do) requires recomputing.
+        obstypes.day = {'outTemp'}
+        self.assertFalse(user.loopdata.LoopData.compute_covers_current(obstypes)['day'])
+
     def test_get_fields_to_include(self) -> None:
 
         specified_fields: Set[str] = {'current.dateTime.raw', 'current.outTemp', 'trend.outTemp', 'trend.barometer.code',
@@ -686,6 +705,14 @@ class ProcessPacketTests(unittest.TestCase):
         self.assertTrue(user.loopdata.CheetahName(
             'day.wind.maxtime', None, None, 'day', 'wind', 'maxtime', None) in fields_to_include)
 
+        fields_by_period = user.loopdata.LoopData.group_fields_by_period(fields_to_include)
+        self.assertEqual(sorted(fields_by_period.keys()), ['10m', '24h', '2m', 'current', 'day', 'hour', 'trend'])
+        self.assertEqual(sorted([cname.field for cname in fields_by_period['trend']]),
+            ['trend.barometer.code', 'trend.barometer.desc', 'trend.outTemp'])
+        self.assertEqual(len(fields_by_period['day']), 5)
+        self.assertEqual(user.loopdata.LoopData.group_fields_by_period({user.loopdata.LoopData.parse_cname('unit.label.outTemp')}),
+            {'unit': [user.loopdata.CheetahName('unit.label.outTemp', 'unit', 'label', None, 'outTemp', None, None)]})
+
         self.assertEqual(len(obstypes.current), 10)
         self.assertTrue('inTemp' in obstypes.current)
         self.assertTrue('outTemp' in obstypes.current)
@@ -850,6 +877,49 @@ class ProcessPacketTests(unittest.TestCase):
         baroTrend = user.loopdata.LoopProcessor.get_barometer_trend(-0.26577, 'inHg', 'group_pressure', 10800)
         self.assertEqual(baroTrend, user.loopdata.BarometerTrend.FALLING_VERY_RAPIDLY)
 
+    def test_get_windrun_bucket(self) -> None:
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(0.0), 0)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(11.2), 0)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(11.25), 1)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(90.0), 4)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(180.0), 8)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(348.7), 15)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(348.75), 0)
+        self.assertEqual(user.loopdata.LoopProcessor.get_windrun_bucket(360.0), 0)
+
+    def test_add_windrun_and_beaufort(self) -> None:
+        """ test that windrun, windrun_<dir> and beaufort are only added when needed. """
+
+        pkt: Dict[str, Any] = { 'dateTime': 1593883054, 'usUnits': weewx.US, 'interval': 2.0 / 60.0,
+            'windSpeed': 9.0, 'windDir': 90.0 }
+        user.loopdata.LoopProcessor.add_windrun_and_beaufort(pkt, {'outTemp', 'windSpeed'})
+        self.assertNotIn('windrun', pkt)
+        self.assertNotIn('beaufort', pkt)
+
+        user.loopdata.LoopProcessor.add_windrun_and_beaufort(pkt, {'windrun_E', 'beaufort', 'windSpeed', 'windDir'})
+        self.assertAlmostEqual(pkt['windrun'], 0.005)
+        self.assertAlmostEqual(pkt['windrun_E'], 0.005)
+        self.assertEqual(pkt['beaufort'], 3)
+
+        # A windSpeed of None yields a windrun of None (and no windrun_<dir>).
+        pkt = { 'dateTime': 1593883054, 'usUnits': weewx.US, 'interval': 2.0 / 60.0,
+            'windSpeed': None, 'windDir': None }
+        user.loopdata.LoopProcessor.add_windrun_and_beaufort(pkt, {'windrun', 'windSpeed', 'windDir'})
+        self.assertIsNone(pkt['windrun'])
+        self.assertNotIn('windrun_N', pkt)
+
+    def test_convert_packet(self) -> None:
+        """ test that convert_packet matches convertDict. """
+
+        pkt: Dict[str, Any] = { 'dateTime': 1593883054, 'usUnits': weewx.METRICWX, 'outTemp': 21.5,
+            'barometer': 1015.9, 'windSpeed': 3.2, 'windDir': 270.0, 'rain': 0.2, 'UV': 3.0,
+            'outHumidity': None, 'unknownObs': 7 }
+        for unit_system in [weewx.US, weewx.METRIC, weewx.METRICWX]:
+            expected: Dict[str, Any] = weewx.units.StdUnitConverters[unit_system].convertDict(pkt)
+            # Twice, the second time uses the cached conversions.
+            self.assertEqual(user.loopdata.LoopProcessor.convert_packet(pkt, unit_system), expected)
+            self.assertEqual(user.loopdata.LoopProcessor.convert_packet(pkt, unit_system), expected)
+
     def test_prune_period_packet(self) -> None:
         """ test that packet is pruned to just the observations needed. """
 
@@ -3419,6 +3489,133 @@ class ProcessPacketTests(unittest.TestCase):
         self.assertEqual(loopdata_pkt['13h.outTemp.min'], '75.0°F')
         self.assertEqual(loopdata_pkt['13h.rain.sum'], '0.01 in')
 
+    def test_trend_non_scalar(self) -> None:
+        specified_fields = [ 'trend.wind', 'trend.wind.raw', 'trend.windSpeed.raw' ]
+        cfg: user.loopdata.Configuration = ProcessPacketTests._get_config('us', 10800, 1, 6, specified_fields)
+
+        # July 1, 2020 Noon PDT
+        pkt: Dict[str, Any] = {'dateTime': 1593630000, 'usUnits': 1, 'windSpeed': 3.0, 'windDir': 180.0}
+
+        accums: user.loopdata.Accumulators = ProcessPacketTests._get_accums(cfg, pkt['dateTime'])
+
+        # First packet.
+        loopdata_pkt = user.loopdata.LoopProcessor.generate_loopdata_dictionary(pkt, cfg, accums)
+
+        # Next packet 1 minute later
+        pkt = {'dateTime': 1593630060, 'usUnits': 1, 'windSpeed': 4.0, 'windDir': 190.0}
+        loopdata_pkt = user.loopdata.LoopProcessor.generate_loopdata_dictionary(pkt, cfg, accums)
+
+        # wind is a vector, no trend is computed for it.
+        self.assertEqual(loopdata_pkt.get('trend.wind'), None)
+        self.assertEqual(loopdata_pkt.get('trend.wind.raw'), None)
+        self.assertAlmostEqual(loopdata_pkt['trend.windSpeed.raw'], 174.19354838709677)
+
+    def test_add_period_obstype_stats_subclass(self) -> None:
+        class MyScalarStats(weewx.accum.ScalarStats):
+            pass
+
+        stats = MyScalarStats()
+        stats.addHiLo(3.0, 1593630000)
+        stats.addHiLo(5.0, 1593630060)
+        accum = weewx.accum.Accum(weeutil.weeutil.TimeSpan(1593586800, 1593673200), unit_system=weewx.US)
+        accum['outTemp'] = stats
+
+        cname = user.loopdata.LoopData.parse_cname('day.outTemp.max.raw')
+        assert cname is not None
+        loopdata_pkt: Dict[str, Any] = {}
+        user.loopdata.LoopProcessor.add_period_obstype(cname, accum, loopdata_pkt,
+            weewx.units.Converter(weewx.units.USUnits), weewx.units.Formatter())
+        self.assertEqual(loopdata_pkt, {'day.outTemp.max.raw': 5.0})
+
+    def test_is_stale(self) -> None:
+        now = to_int(time.time())
+        self.assertFalse(user.loopdata.LoopProcessor.is_stale(now, 3))
+        self.assertTrue(user.loopdata.LoopProcessor.is_stale(now - 10, 3))
+        # 0 means never stale.
+        self.assertFalse(user.loopdata.LoopProcessor.is_stale(now - 10, 0))
+
+    def test_queue_write(self) -> None:
+        cfg: user.loopdata.Configuration = ProcessPacketTests._get_config('us', 10800, 1, 6, ['current.outTemp'])
+        lp: user.loopdata.LoopProcessor = user.loopdata.LoopProcessor(cfg)
+
+        lp.queue_write({'current.outTemp': '77.4°F'}, 1593630000)
+        # Writer has not picked up the first packet, it should be replaced.
+        lp.queue_write({'current.outTemp': '77.3°F'}, 1593630002)
+
+        self.assertEqual(lp.write_queue.get_nowait(), ({'current.outTemp': '77.3°F'}, 1593630002))
+        self.assertTrue(lp.write_queue.empty())
+
+    def test_write_and_upload_skips_unchanged(self) -> None:
+        cfg: user.loopdata.Configuration = ProcessPacketTests._get_config('us', 10800, 1, 6, ['current.outTemp'])
+        cfg.enable = False
+        with tempfile.TemporaryDirectory() as loop_data_dir:
+            cfg.tmpname = os.path.join(loop_data_dir, '.loop-data.txt.tmp')
+            cfg.local_path = os.path.join(loop_data_dir, 'loop-data.txt')
+            lp: user.loopdata.LoopProcessor = user.loopdata.LoopProcessor(cfg)
+            with unittest.mock.patch.object(user.loopdata.LoopProcessor, 'write_packet_to_file',
+                    wraps=user.loopdata.LoopProcessor.write_packet_to_file) as write_packet_to_file:
+                for pkt_time in [1593630000, 1593630002]:
+                    # Same contents both times.
+                    lp.queue_write({'current.outTemp': '77.4°F'}, pkt_time)
+                    lp.write_and_upload(*lp.write_queue.get_nowait())
+                self.assertEqual(write_packet_to_file.call_count, 1)
+
+                # Changed contents are written.
+                lp.queue_write({'current.outTemp': '77.3°F'}, 1593630004)
+                lp.write_and_upload(*lp.write_queue.get_nowait())
+                self.assertEqual(write_packet_to_file.call_count, 2)
+            with open(cfg.local_path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {'current.outTemp': '77.3°F'})
+
+    def test_process_events(self) -> None:
+        pkt_time: int = 1593630000
+        cfg: user.loopdata.Configuration = ProcessPacketTests._get_config('us', 10800, 1, 6, ['current.outTemp', 'day.outTemp.max.raw'])
+        lp: user.loopdata.LoopProcessor = user.loopdata.LoopProcessor(cfg)
+
+        # Accumulators arrive first, then a burst of loop packets.
+        accums: user.loopdata.Accumulators = ProcessPacketTests._get_accums(cfg, pkt_time)
+        cfg.queue.put(accums)
+        for i, out_temp in enumerate([77.2, 77.5, 77.3]):
+            cfg.queue.put(weewx.Event(weewx.NEW_LOOP_PACKET, packet={
+                'dateTime': pkt_time + 2 * i, 'usUnits': weewx.US, 'outTemp': out_temp}))
+
+        events = lp.drain_queue()
+        self.assertEqual(len(events), 4)
+        self.assertTrue(cfg.queue.empty())
+        lp.process_events(events)
+
+        # Every loop packet made it into the accumulators.
+        self.assertIs(lp.accumulators, accums)
+        self.assertEqual(accums.day_accum['outTemp'].count, 3)
+        self.assertEqual(accums.day_accum['outTemp'].max, 77.5)
+
+        # But only the newest was written.
+        loopdata_pkt, written_time = lp.write_queue.get_nowait()
+        self.assertEqual(written_time, pkt_time + 4)
+        self.assertEqual(loopdata_pkt['current.outTemp'], '77.3°F')
+        self.assertEqual(loopdata_pkt['day.outTemp.max.raw'], 77.5)
+        self.assertTrue(lp.write_queue.empty())
+
+    def test_encode_json(self) -> None:
+        # Same bytes whether or not orjson is installed: compact and UTF-8.
+        self.assertEqual(user.loopdata.encode_json({'current.outTemp': '77.4°F', 'current.outTemp.raw': 77.4}),
+            '{"current.outTemp":"77.4°F","current.outTemp.raw":77.4}'.encode('utf-8'))
+
+    def test_write_packet_to_file(self) -> None:
+        with tempfile.TemporaryDirectory() as loop_data_dir:
+            tmpname = os.path.join(loop_data_dir, 'LoopDataTmp')
+            user.loopdata.LoopProcessor.write_packet_to_file({'current.outTemp': '77.4°F'},
+                tmpname, os.path.join(loop_data_dir, 'loop-data.txt'), False)
+            self.assertFalse(os.path.exists(tmpname))
+            with open(os.path.join(loop_data_dir, 'loop-data.txt'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {'current.outTemp': '77.4°F'})
+
+            # Overwrite with a new packet (synced this time).
+            user.loopdata.LoopProcessor.write_packet_to_file({'current.outTemp': '77.3°F'},
+                tmpname, os.path.join(loop_data_dir, 'loop-data.txt'), True)
+            with open(os.path.join(loop_data_dir, 'loop-data.txt'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {'current.outTemp': '77.3°F'})
+
     @staticmethod
     def _get_accums(cfg: user.loopdata.Configuration, pkt_time) -> user.loopdata.Accumulators:
         """
@@ -3480,21 +3677,27 @@ class ProcessPacketTests(unittest.TestCase):
             archive_interval         = to_int(std_archive_dict.get('archive_interval')),
             loop_data_dir            = '', # dummy
             filename                 = '', # dummy
+            local_path               = '', # dummy
             target_report            = '', # dummy
             loop_frequency           = 2.0,
             specified_fields         = specified_fields,
             fields_to_include        = fields_to_include,
+            fields_by_period         = user.loopdata.LoopData.group_fields_by_period(fields_to_include),
             formatter                = formatter,
             converter                = converter,
             tmpname                  = '', # dummy
+            sync_on_write            = False, # dummy
             enable                   = True, # dummy
             remote_server            = '', # dummy
             remote_port              = 22, # dummy
             remote_user              = '', # dummy
             remote_dir               = '', # dummy
+            remote_path              = '', # dummy
             compress                 = True, # dummy
             log_success              = False, # dummy
             ssh_options              = '', # dummy
+            reuse_ssh_connection     = False, # dummy
+            ssh_control_path         = None, # dummy
             timeout                  = 1, # dummy
             skip_if_older_than       = 3, # dummy
             time_delta               = time_delta,
@@ -54,6 +54,7 @@ class LoopDataInstaller(ExtensionInstaller):
                         'compress': 'false',
                         'log_success': 'false',
                         'ssh_options': '-o ConnectTimeout=1',
+                        'reuse_ssh_connection': 'false',
                         'timeout': '1',
                         'skip_if_older_than': '3'},
                     'Include': {